@@ -1,3 +1,5 @@
+import uuid
+import timeit
 from datetime import datetime
 
 import numpy
@@ -39,3 +41,12 @@ class TestPerf(object):
 
         # This is just a benchmark. This should NEVER take this long.
         assert numpy.average(timing[1:]) < 10
+
+    @pytest.mark.parametrize('generator', [wryte.generate_cid, wryte.uuid4_cid])
+    def test_cid_generator(self, generator):
+        # Any cid generator plugged into Wryte should be at least
+        # as fast as the original `str(uuid.uuid4())`.
+        baseline = min(timeit.repeat(lambda: str(uuid.uuid4()), number=10000, repeat=5))
+        timing = min(timeit.repeat(generator, number=10000, repeat=5))
+
+        assert timing < baseline * 1.2
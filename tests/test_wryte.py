@@ -1,8 +1,17 @@
+import io
 import os
 import sys
+import json
+import time
+import random
 import uuid
 import shlex
+import socket
+import struct
+import asyncio
 import logging
+import warnings
+import threading
 
 import pytest
 import click.testing as clicktest
@@ -20,6 +29,29 @@ def _invoke(command):
     return cli.invoke(getattr(wryte, func), params)
 
 
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.msg)
+
+
+@pytest.fixture
+def config_env(monkeypatch):
+    """Set Wryte env vars for a test and reload the shared config around it."""
+
+    def setenv(**variables):
+        for key, value in variables.items():
+            monkeypatch.setenv('WRYTE_{}'.format(key), value)
+        return wryte.reload_config()
+
+    yield setenv
+    monkeypatch.undo()
+    wryte.reload_config()
+
+
 class TestWryte(object):
     def test_simple(self):
         w = Wryte(name=str(uuid.uuid4()), simple=True)
@@ -84,6 +116,23 @@ class TestWryte(object):
 
         cid = w.event('Event')
         assert len(cid) == len(str(uuid.uuid4()))
+        assert uuid.UUID(cid).version == 7
+
+    def test_event_cids_are_time_ordered(self):
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+
+        cids = [w.event('Event') for _ in range(100)]
+        assert cids == sorted(cids)
+        assert len(set(cids)) == len(cids)
+
+    def test_event_cid_generator(self):
+        w = Wryte(name=str(uuid.uuid4()), cid_generator=lambda: 'my_cid')
+
+        assert w.event('Event') == 'my_cid'
+        assert w.event('Event', cid='user_id') == 'user_id'
+
+        w = Wryte(name=str(uuid.uuid4()), cid_generator=wryte.uuid4_cid)
+        assert uuid.UUID(w.event('Event')).version == 4
 
     def test_bind_unbind(self):
         w = Wryte(name=str(uuid.uuid4()))
@@ -182,4 +231,827 @@ class TestWryte(object):
         assert w.logger.getEffectiveLevel() == 10
 
     def test_cli(self):
-        _invoke('main info My Message x=y')
+        result = _invoke('main info My Message x=y')
+        assert result.exit_code == 0
+
+
+class TestWryteConfig(object):
+    def test_typed_values(self):
+        config = wryte.WryteConfig(
+            {
+                'CONSOLE_DISABLED': 'false',
+                'CONSOLE_JSONIFY': 'true',
+                'CONSOLE_LEVEL': 'DEBUG',
+                'HANDLERS_FILE_MAX_BYTES': '100',
+            }
+        )
+        assert config.get('CONSOLE_DISABLED') is False
+        assert config.get('CONSOLE_JSONIFY') is True
+        assert config.get('CONSOLE_LEVEL') == 'debug'
+        assert config.get('HANDLERS_FILE_MAX_BYTES') == 100
+        assert config.get('HANDLERS_FILE_PATH', default='x') == 'x'
+
+    def test_logger_scope(self):
+        config = wryte.WryteConfig({'CONSOLE_LEVEL': 'info', 'MY_LOGGER_CONSOLE_LEVEL': 'debug'})
+        assert config.get('CONSOLE_LEVEL') == 'info'
+        assert config.get('CONSOLE_LEVEL', 'my_logger') == 'debug'
+        assert config.get('CONSOLE_LEVEL', 'other_logger') == 'info'
+
+    def test_invalid_values_are_ignored(self):
+        with pytest.warns(UserWarning):
+            config = wryte.WryteConfig({'CONSOLE_LEVEL': 'booboo', 'HANDLERS_FILE_MAX_BYTES': 'many'})
+        assert config.get('CONSOLE_LEVEL') is None
+        assert config.get('HANDLERS_FILE_MAX_BYTES', default=7) == 7
+
+    def test_config_file(self, tmp_path):
+        config_file = tmp_path / 'wryte.json'
+        config_file.write_text('{"CONSOLE_LEVEL": "debug", "CONSOLE_JSONIFY": true}')
+
+        config = wryte.WryteConfig.load(
+            {'WRYTE_CONFIG_FILE': str(config_file), 'WRYTE_CONSOLE_LEVEL': 'error', 'PATH': '/bin'}
+        )
+        assert config.get('CONSOLE_LEVEL') == 'error'
+        assert config.get('CONSOLE_JSONIFY') is True
+
+    def test_config_file_not_an_object(self, tmp_path):
+        config_file = tmp_path / 'wryte.json'
+        config_file.write_text('[1, 2]')
+        with pytest.warns(UserWarning, match='not a JSON object'):
+            config = wryte.WryteConfig.load({'WRYTE_CONFIG_FILE': str(config_file), 'WRYTE_CONSOLE_LEVEL': 'error'})
+        assert config.get('CONSOLE_LEVEL') == 'error'
+
+    def test_unknown_variables(self):
+        config = wryte.WryteConfig({'HANDLERS_LOGZIO_TOKEN': 'global', 'MY_LOGGER_HANDLERS_LOGZIO_TOKEN': 'mine'})
+        assert config.get('HANDLERS_LOGZIO_TOKEN') == 'global'
+        assert config.get('HANDLERS_LOGZIO_TOKEN', 'my_logger') == 'mine'
+        assert config.get('HANDLERS_LOGZIO_TOKEN', 'other') == 'global'
+        assert config.get('HANDLERS_OTHER_TOKEN', default='x') == 'x'
+
+    def test_shared_config(self, config_env):
+        config = config_env(CONSOLE_LEVEL='debug')
+        assert wryte.get_config() is config
+
+        w = Wryte(name=str(uuid.uuid4()))
+        assert w.logger.getEffectiveLevel() == 10
+
+    def test_reload_config(self, config_env, tmp_path):
+        w = Wryte(name='my_logger')
+        w.bind(k='v')
+        logger = w.logger
+        assert w.list_handlers() == ['_console']
+        assert logger.getEffectiveLevel() == 20
+
+        path = str(tmp_path / 'log.txt')
+        config_env(MY_LOGGER_CONSOLE_JSONIFY='true', CONSOLE_LEVEL='debug', HANDLERS_FILE_PATH=path)
+        assert w.logger is logger
+        assert w.list_handlers() == ['_json', 'file']
+        assert isinstance(logger.handlers[0].formatter, wryte.JsonFormatter)
+        assert w._log['k'] == 'v'
+
+        w.info('My Message')
+        assert os.path.isfile(path)
+
+    def test_reload_config_keeps_added_handlers(self, config_env):
+        w = Wryte(name=str(uuid.uuid4()))
+        w.add_handler(handler=logging.StreamHandler(sys.stdout), name='mine')
+
+        config_env(CONSOLE_DISABLED='true')
+        assert w.list_handlers() == ['mine']
+
+    def test_reload_config_keeps_same_named_handlers(self, config_env, tmp_path):
+        name = str(uuid.uuid4())
+        config_env(HANDLERS_FILE_PATH=str(tmp_path / 'log.txt'))
+        w = Wryte(name=name)
+        other = Wryte(name=name, bare=True)
+        mine = logging.StreamHandler(sys.stdout)
+        other.add_handler(handler=mine, name='file')
+
+        config_env(CONSOLE_LEVEL='debug')
+        config_env(CONSOLE_LEVEL='info')
+        assert mine in w.logger.handlers
+        assert w.list_handlers().count('file') == 2
+        assert w.list_handlers().count('_console') == 1
+
+    def test_reload_config_skips_bare(self, config_env):
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        config_env(CONSOLE_LEVEL='debug')
+        assert w.list_handlers() == []
+
+
+class TestAsyncWryte(object):
+    def test_log_and_flush(self):
+        handler = _ListHandler()
+
+        async def run():
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True)
+            w.add_handler(handler=handler, name='list', level='debug')
+            assert w.list_handlers() == ['list']
+
+            w.info('My Message', k='v')
+            w.event('My Event')
+            await w.flush()
+            assert [record['message'] for record in handler.records] == ['My Message', 'My Event']
+
+            await w.aclose()
+            assert w.list_handlers() == []
+
+        asyncio.run(run())
+
+    def test_per_task_context(self):
+        handler = _ListHandler()
+
+        async def run():
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True)
+            w.add_handler(handler=handler, level='debug')
+            w.bind(shared='v')
+
+            async def request(request_id):
+                w.bind(request_id=request_id)
+                await asyncio.sleep(0)
+                w.info('Handling')
+
+            await asyncio.gather(request(1), request(2))
+            w.info('Done')
+            await w.aclose()
+
+        asyncio.run(run())
+        assert sorted(record.get('request_id') for record in handler.records[:2]) == [1, 2]
+        assert all(record['shared'] == 'v' for record in handler.records)
+        assert 'request_id' not in handler.records[2]
+
+    def test_bounded_queue(self):
+        released = threading.Event()
+
+        class BlockedHandler(_ListHandler):
+            def emit(self, record):
+                released.wait(5)
+                _ListHandler.emit(self, record)
+
+        handler = BlockedHandler()
+
+        async def run():
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True, queue_size=10, stats=True)
+            w.add_handler(handler=handler, name='blocked')
+            for i in range(100):
+                w.info('My Message', i=i)
+
+            stats = w.stats()['handlers']['blocked']
+            released.set()
+            await w.aclose()
+            return stats
+
+        stats = asyncio.run(run())
+        assert stats['queued'] == 10
+        assert stats['dropped'] == 100 - len(handler.records)
+        assert 10 <= len(handler.records) <= 11
+
+    def test_reload_does_not_wait_for_queued_records(self):
+        released = threading.Event()
+
+        class BlockedHandler(_ListHandler):
+            def emit(self, record):
+                released.wait(5)
+                _ListHandler.emit(self, record)
+
+        handler = BlockedHandler()
+        w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=handler)
+        w._bare = False
+        w._configured_handlers = list(w.logger.handlers)
+        w.info('My Message')
+
+        start = time.monotonic()
+        w._reconfigure()
+        assert time.monotonic() - start < 1
+        released.set()
+
+    def test_remove_handler_does_not_wait_for_queued_records(self):
+        released = threading.Event()
+
+        class BlockedHandler(_ListHandler):
+            def emit(self, record):
+                released.wait(5)
+                _ListHandler.emit(self, record)
+
+        handler = BlockedHandler()
+
+        async def run():
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True)
+            w.add_handler(handler=handler, name='blocked')
+            w.add_handler(handler=_ListHandler(), name='list')
+            w.info('My Message')
+
+            start = time.monotonic()
+            w.remove_handler('blocked')
+            assert time.monotonic() - start < 1
+            assert w.list_handlers() == ['list']
+            released.set()
+
+            await w.aremove_handler('list')
+            assert w.list_handlers() == []
+
+        asyncio.run(run())
+
+    def test_slow_consumer_does_not_block_loop(self):
+        """Log to a pipe nobody reads until the loop was measured.
+
+        The pipe fills up quickly, which would block a synchronous
+        `StreamHandler` (and with it, the event loop) indefinitely.
+        """
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(write_fd, 'w')
+        received = []
+
+        def consume():
+            with os.fdopen(read_fd) as reader:
+                received.extend(reader)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True)
+            w.add_handler(handler=logging.StreamHandler(stream), formatter='json')
+            lags = []
+
+            async def measure_lag():
+                for _ in range(20):
+                    start = loop.time()
+                    await asyncio.sleep(0.005)
+                    lags.append(loop.time() - start - 0.005)
+
+            measuring = asyncio.ensure_future(measure_lag())
+            for i in range(2000):
+                w.info('x' * 200, i=i)
+                if i % 100 == 0:
+                    await asyncio.sleep(0)
+            await measuring
+
+            consumer = threading.Thread(target=consume)
+            consumer.start()
+            await asyncio.wait_for(w.flush(), 10)
+            await w.aclose()
+            stream.close()
+            consumer.join()
+            return lags
+
+        lags = asyncio.run(run())
+        assert max(lags) < 0.05
+        assert len(received) == 2000
+        assert json.loads(received[-1])['i'] == 1999
+
+
+class TestCompact(object):
+    def _records(self, count=100):
+        w = Wryte(name='my-service', hostname='ip-10-0-0-1.ec2.internal', bare=True)
+        w.bind(service_version='1.2.3')
+        records = [w._enrich('Handled request', 'info', ({'path': '/users', 'status': 200, 'took': 0.25},)) for _ in range(count)]
+        records.append(w._enrich('Event', 'info', ({'type': 'event', 'cid': 'x', 'nested': {'a': [1, -2, None, True]}},)))
+        return records
+
+    def _encode(self, records):
+        formatter = wryte.CompactFormatter()
+        return wryte.COMPACT_MAGIC + b''.join(
+            formatter.format(logging.makeLogRecord({'msg': record})) for record in records
+        )
+
+    def test_round_trip(self):
+        records = self._records()
+        assert list(wryte.decode_compact(io.BytesIO(self._encode(records)))) == records
+
+    def test_timestamps(self):
+        records = [
+            {'timestamp': '2020-01-01T00:00:00.000000', 'nested': {'timestamp': '2020-01-01T00:00:00.000000'}},
+            {'timestamp': '2020-01-01T00:00:00', 'k': 'v'},
+            {'timestamp': 'not a timestamp'},
+        ]
+        assert list(wryte.decode_compact(io.BytesIO(self._encode(records)))) == records
+
+    def test_size(self):
+        records = self._records()
+        json_size = sum(len(json.dumps(record)) + 1 for record in records)
+        assert json_size / len(self._encode(records)) > 3
+
+    def test_bad_stream(self):
+        with pytest.raises(wryte.WryteError):
+            list(wryte.decode_compact(io.BytesIO(b'R\x01\x00')))
+        with pytest.raises(wryte.WryteError):
+            list(wryte.decode_compact(io.BytesIO(self._encode(self._records(1))[:-3])))
+
+    def test_corrupt_stream(self, tmp_path):
+        # A record referencing an undefined symbol.
+        with pytest.raises(wryte.WryteError, match='Corrupt'):
+            list(wryte.decode_compact(io.BytesIO(wryte.COMPACT_MAGIC + b'R\x06\x00\x08\x01\x06\x05\x00')))
+
+        data = self._encode(self._records(10))
+        rand = random.Random(0)
+        for _ in range(500):
+            corrupt = bytearray(data)
+            for _ in range(3):
+                corrupt[rand.randrange(len(wryte.COMPACT_MAGIC), len(corrupt))] = rand.randrange(256)
+            try:
+                list(wryte.decode_compact(io.BytesIO(bytes(corrupt))))
+            except wryte.WryteError:
+                pass
+
+        path = tmp_path / 'log.bin'
+        path.write_bytes(wryte.COMPACT_MAGIC + b'S\x02\xff\xfe')
+        result = _invoke(['decode', str(path)])
+        assert result.exit_code == 1
+        assert 'Corrupt' in result.output
+
+    def test_shapes(self):
+        w = Wryte(name='my-service', hostname='my-host', bare=True)
+        records = [w._enrich('Message', 'info', ({'k': i},)) for i in range(3)]
+        records.append(w._enrich('Message', 'info', ({'other': 'v'},)))
+        records.append({'name': {'unhashable': True}, 'k': 1})
+        records.append({'name': 'no-base-hit', 'k': 2})
+        records.extend(records[:2])
+        assert list(wryte.decode_compact(io.BytesIO(self._encode(records)))) == records
+
+    def test_file_handler(self, tmp_path):
+        path = str(tmp_path / 'log.bin')
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=wryte.CompactFileHandler(path), name='compact', formatter='compact')
+        w.info('Message 1', k='v')
+        w.remove_handler('compact')
+
+        # A second writer appends a new segment to the same file.
+        w.add_handler(handler=wryte.CompactFileHandler(path), name='compact', formatter='compact')
+        w.info('Message 2')
+
+        with open(path, 'rb') as stream:
+            records = list(wryte.decode_compact(stream))
+        assert [record['message'] for record in records] == ['Message 1', 'Message 2']
+        assert records[0]['k'] == 'v'
+
+    def test_file_handler_default_formatter(self, tmp_path):
+        path = str(tmp_path / 'log.bin')
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=wryte.CompactFileHandler(path))
+        w.info('My Message')
+
+        with open(path, 'rb') as stream:
+            assert [record['message'] for record in wryte.decode_compact(stream)] == ['My Message']
+
+    def test_file_handler_rotation(self, tmp_path):
+        path = str(tmp_path / 'log.bin')
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=wryte.CompactFileHandler(path, maxBytes=1024, backupCount=3), formatter='compact')
+        for i in range(100):
+            w.info('Message', i=i)
+
+        records = []
+        for suffix in ('.3', '.2', '.1', ''):
+            assert os.path.getsize(path + suffix) <= 1024
+            with open(path + suffix, 'rb') as stream:
+                records.extend(wryte.decode_compact(stream))
+        assert [record['i'] for record in records] == list(range(100 - len(records), 100))
+
+    @pytest.mark.skipif(wryte.fcntl is None, reason='Requires fcntl')
+    def test_file_handler_single_writer(self, tmp_path):
+        path = str(tmp_path / 'log.bin')
+        first = Wryte(name=str(uuid.uuid4()), bare=True)
+        first.add_handler(handler=wryte.CompactFileHandler(path), name='compact')
+        second = Wryte(name=str(uuid.uuid4()), bare=True)
+        with pytest.warns(UserWarning, match='another process'):
+            second.add_handler(handler=wryte.CompactFileHandler(path), name='compact')
+
+        for i in range(3):
+            first.info('First', user=i)
+            second.info('Second', path=i)
+
+        with open(path, 'rb') as stream:
+            assert [record['user'] for record in wryte.decode_compact(stream)] == [0, 1, 2]
+        with open('{}.{}'.format(path, os.getpid()), 'rb') as stream:
+            assert [record['path'] for record in wryte.decode_compact(stream)] == [0, 1, 2]
+        first.remove_handler('compact')
+        second.remove_handler('compact')
+
+    @pytest.mark.skipif(os.name == 'nt', reason='Files are not watched on Windows')
+    @pytest.mark.parametrize('rotation', ['move', 'copytruncate'])
+    def test_file_handler_external_rotation(self, tmp_path, rotation):
+        path = str(tmp_path / 'log.bin')
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=wryte.CompactFileHandler(path), name='compact')
+        w.info('Message 1', k='v')
+
+        if rotation == 'move':
+            os.rename(path, path + '.1')
+        else:
+            with open(path, 'rb') as source, open(path + '.1', 'wb') as target:
+                target.write(source.read())
+            os.truncate(path, 0)
+        w.info('Message 2', k='v')
+        w.remove_handler('compact')
+
+        for suffix, message in (('.1', 'Message 1'), ('', 'Message 2')):
+            with open(path + suffix, 'rb') as stream:
+                assert [record['message'] for record in wryte.decode_compact(stream)] == [message]
+
+    def test_file_handler_from_env(self, config_env, tmp_path):
+        path = str(tmp_path / 'log.bin')
+        config_env(HANDLERS_FILE_PATH=path, HANDLERS_FILE_FORMATTER='compact', CONSOLE_DISABLED='true')
+        w = Wryte(name=str(uuid.uuid4()))
+        assert isinstance(w.logger.handlers[0], wryte.CompactFileHandler)
+        w.info('My Message')
+
+        result = _invoke(['decode', path])
+        assert result.exit_code == 0
+        assert json.loads(result.output)['message'] == 'My Message'
+
+        result = _invoke(['decode', '--console', '--no-color', path])
+        assert result.exit_code == 0
+        assert 'INFO - My Message' in result.output
+        w.remove_handler('file')
+
+
+class _FailingFormatter(logging.Formatter):
+    def format(self, record):
+        raise ValueError('Boom')
+
+
+class TestStats(object):
+    def test_disabled(self):
+        w = Wryte(name=str(uuid.uuid4()))
+        w.info('My Message')
+        assert w.stats() is None
+        assert 'handle' not in vars(w.logger.handlers[0])
+
+    def test_levels_and_handlers(self):
+        w = Wryte(name=str(uuid.uuid4()), bare=True, stats=True)
+        handler = _ListHandler()
+        handler.addFilter(lambda record: record.msg['message'] != 'Filtered')
+        w.add_handler(handler=handler, name='list', level='info')
+
+        w.debug('Dropped by the logger')
+        w.info('Filtered')
+        w.warning('My Message')
+        w.error('My Message')
+
+        stats = w.stats()
+        assert stats['levels'] == {'DEBUG': 1, 'INFO': 1, 'WARNING': 1, 'ERROR': 1}
+        assert stats['dropped'] == 1
+        assert stats['enrich']['count'] == 4
+        assert stats['handlers']['list']['records'] == 2
+        assert stats['handlers']['list']['dropped'] == 1
+        assert stats['handlers']['list']['errors'] == 0
+        assert stats['handlers']['list']['format']['count'] == 2
+        assert stats['handlers']['list']['emit']['p99_us'] >= 1
+
+    def test_errors(self, monkeypatch):
+        monkeypatch.setattr(logging, 'raiseExceptions', False)
+        w = Wryte(name=str(uuid.uuid4()), bare=True, stats=True)
+        w.add_handler(handler=logging.StreamHandler(sys.stdout), name='failing', formatter=_FailingFormatter())
+
+        w.info('My Message')
+        assert w.stats()['handlers']['failing']['errors'] == 1
+
+    def test_concurrent_latencies(self):
+        class SlowFormatter(logging.Formatter):
+            def format(self, record):
+                time.sleep(0.002)
+                return ''
+
+        w = Wryte(name=str(uuid.uuid4()), bare=True, stats=True)
+        w.add_handler(handler=logging.StreamHandler(io.StringIO()), name='slow', formatter=SlowFormatter())
+
+        def log():
+            for _ in range(10):
+                w.info('My Message')
+
+        threads = [threading.Thread(target=log) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = w.stats()['handlers']['slow']
+        assert stats['records'] == 80
+        # Neither other threads' format time nor waiting for the lock leak in.
+        assert stats['format']['p50_us'] <= 4096
+        assert stats['emit']['p50_us'] <= 1024
+
+    def test_self_report(self):
+        w = Wryte(name=str(uuid.uuid4()), bare=True, stats=True, stats_interval=0.000001)
+        handler = _ListHandler()
+        w.add_handler(handler=handler)
+
+        time.sleep(0.001)
+        w.info('My Message')
+        assert [record['message'] for record in handler.records] == ['Wryte stats', 'My Message']
+        assert handler.records[0]['_stats']['levels'] == {'INFO': 1}
+
+    def test_enabled_from_env(self, config_env):
+        config_env(STATS_ENABLED='true')
+        w = Wryte(name=str(uuid.uuid4()))
+        w.info('My Message')
+        assert w.stats()['handlers']['_console']['records'] == 1
+
+    def test_async(self):
+        async def run():
+            w = wryte.AsyncWryte(name=str(uuid.uuid4()), bare=True, stats=True)
+            w.add_handler(handler=_ListHandler(), name='list')
+            w.info('My Message')
+            await w.aclose()
+            return w.stats()
+
+        assert asyncio.run(run())['handlers']['list']['records'] == 1
+
+
+def _fail(depth=0):
+    if depth:
+        _fail(depth - 1)
+    raise ValueError('Boom')
+
+
+class TestException(object):
+    def _wryter(self):
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        handler = _ListHandler()
+        w.add_handler(handler=handler)
+        return w, handler.records
+
+    def test_exception(self):
+        w, records = self._wryter()
+        try:
+            _fail()
+        except ValueError:
+            w.exception('Failed', k='v')
+
+        record = records[-1]
+        assert record['level'] == 'ERROR'
+        assert record['k'] == 'v'
+        assert 'exc_info' not in record
+        assert record['exception']['type'] == 'ValueError'
+        assert record['exception']['message'] == 'Boom'
+        assert record['exception']['frames'][-1]['name'] == '_fail'
+        assert record['exception']['frames'][-1]['line'] == "raise ValueError('Boom')"
+        json.dumps(record)
+
+    def test_exc_info(self):
+        w, records = self._wryter()
+        try:
+            _fail()
+        except ValueError as ex:
+            w.warning('Instance', exc_info=ex)
+            w.info('Tuple', exc_info=sys.exc_info())
+            w.error('True', exc_info=True)
+        w.error('No exception', exc_info=True)
+
+        assert [record['exception']['type'] for record in records[:3]] == ['ValueError'] * 3
+        assert 'exception' not in records[3]
+
+    def test_frames_are_cached(self):
+        w, records = self._wryter()
+        for _ in range(3):
+            try:
+                _fail()
+            except ValueError:
+                w.exception('Failed')
+        try:
+            _fail(1)
+        except ValueError:
+            w.exception('Failed')
+
+        assert records[0]['exception']['frames'] is records[2]['exception']['frames']
+        assert records[0]['exception']['frames'] is not records[3]['exception']['frames']
+
+    def test_limits(self):
+        w, records = self._wryter()
+        w.exception_max_frames = 3
+        w.exception_max_message = 2
+        try:
+            _fail(10)
+        except ValueError:
+            w.exception('Failed')
+
+        exception = records[-1]['exception']
+        assert len(exception['frames']) == 3
+        assert exception['frames_omitted'] == 9
+        assert exception['message'] == 'Bo'
+
+    def test_failing_str(self):
+        class BadError(RuntimeError):
+            def __str__(self):
+                raise RuntimeError('Boom')
+
+        w, records = self._wryter()
+        try:
+            raise BadError()
+        except BadError:
+            w.exception('Failed')
+
+        assert records[-1]['exception']['message'] == '<exception str() failed>'
+
+    def test_console(self):
+        formatter = wryte.ConsoleFormatter(color=False)
+        w, records = self._wryter()
+        try:
+            _fail()
+        except ValueError:
+            w.exception('Failed')
+
+        output = formatter.format(logging.makeLogRecord({'msg': records[-1]}))
+        assert 'Traceback (most recent call last):' in output
+        assert output.endswith("    raise ValueError('Boom')\nValueError: Boom")
+
+
+class TestRecordLimits(object):
+    def _record(self, **fields):
+        w = Wryte(name='limits', hostname='my-host', bare=True)
+        return w._enrich('My Message', 'info', (fields,))
+
+    def _format(self, record, pretty=False, **limits):
+        formatter = wryte.JsonFormatter(pretty, wryte.RecordLimits(**limits))
+        return formatter.format(logging.makeLogRecord({'msg': record}))
+
+    @pytest.mark.parametrize('pretty', [False, True])
+    def test_within_limits(self, pretty):
+        record = self._record(k={'a': [1, 2.5, None, True, 'v"\n'], 'b': {}, 'c': []})
+        output = self._format(record, pretty, max_string=100, max_depth=5, max_items=10, max_bytes=10000)
+        assert json.loads(output) == record
+        assert len(output) == len(json.dumps(record, indent=4 if pretty else None))
+
+    def test_no_limits(self):
+        assert wryte.JsonFormatter(limits=wryte.RecordLimits()).limits is None
+
+    def test_max_string(self):
+        output = json.loads(self._format(self._record(body='x' * 1000, nested=['y' * 1000]), max_string=10))
+        assert output['body'] == 'x' * 10
+        assert output['nested'] == ['y' * 10]
+        assert output['_truncated'] is True
+
+    def test_max_depth(self):
+        output = json.loads(self._format(self._record(deep={'a': {'b': {'c': 1}}, 'l': [[1, 2]]}), max_depth=1))
+        assert output['deep'] == {'a': '<dict of 1 items>', 'l': '<list of 1 items>'}
+        assert output['_truncated'] is True
+
+    def test_max_items(self):
+        output = json.loads(self._format(self._record(many=list(range(1000)), keys={str(i): i for i in range(10)}), max_items=3))
+        assert output['many'] == [0, 1, 2]
+        assert output['keys'] == {'0': 0, '1': 1, '2': 2}
+        assert output['message'] == 'My Message'
+
+    @pytest.mark.parametrize('pretty', [False, True])
+    def test_max_bytes(self, pretty):
+        record = self._record(body='x' * 100000, many=list(range(1000)))
+        for max_bytes in range(200, 2000, 50):
+            output = self._format(record, pretty, max_bytes=max_bytes)
+            assert len(output) <= max_bytes
+            parsed = json.loads(output)
+            assert parsed['_truncated'] is True
+            # Wryte's own fields are written first so that they're kept.
+            assert parsed['message'] == 'My Message'
+
+    def test_not_serializable(self):
+        with pytest.raises(TypeError):
+            self._format(self._record(obj=object()), max_bytes=1000)
+
+    def test_logger_limits(self):
+        w = Wryte(name=str(uuid.uuid4()), jsonify=True, limits=wryte.RecordLimits(max_string=5))
+        assert w.logger.handlers[0].formatter.limits.max_string == 5
+
+    @pytest.mark.parametrize('nested', [None, {'a': [1, 2, 'v' * 32]}])
+    def test_within_limits_uses_json_dumps(self, nested):
+        record = self._record(k='v' * 32, n=1, f=1.5, b=True, none=None, nested=nested)
+        output = self._format(record, max_string=32, max_bytes=1000)
+        assert output == json.dumps(record)
+        truncated = json.loads(self._format(record, max_string=32, max_bytes=len(output) - 1))
+        assert truncated['_truncated'] is True
+        assert len(json.loads(self._format(self._record(k='v' * 33), max_string=32))['k']) == 32
+        output = json.loads(self._format(self._record(nested={'a': ['v' * 33, [1, 2, 3, 4]]}), max_string=32, max_items=3))
+        assert output['nested'] == {'a': ['v' * 32, [1, 2, 3]]}
+
+    def test_circular(self):
+        record = self._record()
+        record['self'] = record
+        assert json.loads(self._format(record, max_bytes=1000))['_truncated'] is True
+
+    def test_unapplied_limits_warning(self):
+        with pytest.warns(UserWarning, match='will not apply them'):
+            w = Wryte(name=str(uuid.uuid4()), limits=wryte.RecordLimits(max_bytes=100))
+        with pytest.warns(UserWarning, match='will not apply them'):
+            w.add_handler(handler=logging.StreamHandler(), formatter=wryte.JsonFormatter())
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            w.add_handler(handler=logging.StreamHandler())
+
+    def test_limits_from_env(self, config_env):
+        config_env(MAX_RECORD_BYTES='1000', CONSOLE_JSONIFY='true')
+        w = Wryte(name=str(uuid.uuid4()))
+        assert w.logger.handlers[0].formatter.limits.max_bytes == 1000
+        w.info('My Message', body='x' * 10000)
+
+
+def _parse_journal_fields(data):
+    fields = {}
+    while data:
+        line, data = data.split(b'\n', 1)
+        if b'=' in line:
+            key, value = line.split(b'=', 1)
+        else:
+            key = line
+            (length,) = struct.unpack('<Q', data[:8])
+            value, data = data[8 : 8 + length], data[9 + length :]
+        fields[key.decode()] = value.decode()
+    return fields
+
+
+@pytest.fixture
+def datagram_socket(tmp_path):
+    path = str(tmp_path / 'socket')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+    server.settimeout(5)
+    yield path, server
+    server.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix sockets are not available')
+class TestDatagramHandlers(object):
+    def test_journald(self, datagram_socket):
+        path, server = datagram_socket
+        w = Wryte(name='my_service', bare=True)
+        w.add_handler(handler=wryte.JournaldHandler(path), name='journald', level='debug')
+
+        w.warning('My Message', user_id=1, _private='x', nested={'k': 'v'}, text='multi\nline')
+        fields = _parse_journal_fields(server.recv(65536))
+
+        assert fields['MESSAGE'] == 'My Message'
+        assert fields['PRIORITY'] == '4'
+        assert fields['SYSLOG_IDENTIFIER'] == 'my_service'
+        assert fields['SYSLOG_PID'] == str(os.getpid())
+        assert fields['USER_ID'] == '1'
+        assert fields['PRIVATE'] == 'x'
+        assert json.loads(fields['NESTED']) == {'k': 'v'}
+        assert fields['TEXT'] == 'multi\nline'
+        assert 'LEVEL' not in fields
+
+    def test_journald_reserved_fields(self, datagram_socket):
+        path, server = datagram_socket
+        w = Wryte(name='my_service', bare=True)
+        w.add_handler(handler=wryte.JournaldHandler(path), level='debug')
+
+        w.info('My Message', priority='high', MESSAGE='x', syslog_identifier='y', **{'syslog-pid': 1})
+        data = server.recv(65536)
+        fields = _parse_journal_fields(data)
+
+        assert data.count(b'\nPRIORITY=') + data.startswith(b'PRIORITY=') == 1
+        assert data.count(b'MESSAGE=') == 2
+        assert fields['PRIORITY'] == '6'
+        assert fields['MESSAGE'] == 'My Message'
+        assert fields['SYSLOG_IDENTIFIER'] == 'my_service'
+        assert fields['SYSLOG_PID'] == str(os.getpid())
+        assert fields['CONTEXT_PRIORITY'] == 'high'
+        assert fields['CONTEXT_MESSAGE'] == 'x'
+        assert fields['CONTEXT_SYSLOG_IDENTIFIER'] == 'y'
+        assert fields['CONTEXT_SYSLOG_PID'] == '1'
+
+    def test_syslog(self, datagram_socket):
+        path, server = datagram_socket
+        w = Wryte(name='my_service', bare=True)
+        w.add_handler(handler=wryte.SyslogDatagramHandler(path), level='debug')
+
+        w.error('My Message', k='v')
+        data = server.recv(65536).decode()
+        prefix = '<11>my_service[{}]: '.format(os.getpid())
+        assert data.startswith(prefix)
+        assert json.loads(data[len(prefix) :])['k'] == 'v'
+
+    def test_busy_socket_falls_back(self, datagram_socket):
+        path, server = datagram_socket
+        fallback = _ListHandler()
+        handler = wryte.JournaldHandler(path, fallback=fallback)
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=handler)
+
+        # Nothing is read from the socket, so its queue fills up.
+        for i in range(5000):
+            w.info('My Message', i=i)
+
+        server.setblocking(False)
+        received = 0
+        try:
+            while server.recv(65536):
+                received += 1
+        except BlockingIOError:
+            pass
+        assert fallback.records
+        assert received + len(fallback.records) == 5000
+        assert handler.dropped == 0
+
+    def test_missing_socket(self, tmp_path):
+        handler = wryte.JournaldHandler(str(tmp_path / 'missing'))
+        w = Wryte(name=str(uuid.uuid4()), bare=True)
+        w.add_handler(handler=handler)
+
+        w.info('My Message')
+        assert handler.dropped == 1
+
+    def test_journald_from_env(self, config_env, datagram_socket):
+        path, server = datagram_socket
+        config_env(HANDLERS_JOURNALD_ENABLED='true', HANDLERS_JOURNALD_SOCKET=path, CONSOLE_DISABLED='true')
+        w = Wryte(name=str(uuid.uuid4()))
+        assert w.list_handlers() == ['journald']
+
+        w.info('My Message')
+        assert _parse_journal_fields(server.recv(65536))['MESSAGE'] == 'My Message'
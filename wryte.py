@@ -16,12 +16,23 @@
 
 import os
 import sys
+import time
 import uuid
 import json
+import queue
+import random
+import asyncio
+import contextvars
 import socket
+import struct
+import weakref
+import warnings
+import itertools
+import threading
+import linecache
 import logging
 import logging.handlers
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # pytype: disable=import-error
 try:
@@ -39,6 +50,12 @@ try:
 except ImportError:
     COLOR_ENABLED = False
 
+try:
+    # POSIX only, used to give compact files a single writer
+    import fcntl
+except ImportError:
+    fcntl = None
+
 try:
     import click  # pytype: disable=pyi-error
 
@@ -59,12 +76,500 @@ LEVEL_CONVERSION = {
 }
 
 
+class TimeOrderedCidGenerator:
+    """Generate UUIDv7-style correlation ids which sort chronologically.
+
+    Each id is made of a 48 bit millisecond timestamp, a 26 bit
+    per-process counter and a 48 bit per-process random seed, formatted
+    like a standard uuid (36 characters) so that it can be used anywhere
+    a `uuid4` based cid was used before.
+
+    Unlike `uuid.uuid4`, this does not read `os.urandom` on each call.
+    The seed is drawn once per process (and re-drawn after a fork) and
+    the counter guarantees uniqueness and ordering within the process.
+    """
+
+    _COUNTER_MASK = (1 << 26) - 1
+
+    def __init__(self):
+        self._reseed()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reseed)
+
+    def _reseed(self):
+        # The node part never changes within a process so it is formatted once.
+        self._node = '-%012x' % random.SystemRandom().getrandbits(48)
+        self._counter = itertools.count()
+
+    def __call__(self):
+        millis = time.time_ns() // 1000000
+        counter = next(self._counter) & self._COUNTER_MASK
+        prefix = '%08x-%04x-7%03x-%04x' % (
+            millis >> 16,
+            millis & 0xFFFF,
+            counter >> 14,
+            0x8000 | (counter & 0x3FFF),
+        )
+        return prefix + self._node
+
+
+def uuid4_cid():
+    """Return a random uuid4 based cid (Wryte's original cid format)."""
+    return str(uuid.uuid4())
+
+
+generate_cid = TimeOrderedCidGenerator()
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('', 'false', '0', 'no', 'off')
+
+
+def _to_level(value):
+    level = str(value).lower()
+    if level not in LEVEL_CONVERSION:
+        raise ValueError('level must be one of {}'.format(', '.join(LEVEL_CONVERSION)))
+    return level
+
+
+def _to_formatter(value):
+    if value not in ('json', 'console', 'compact'):
+        raise ValueError('formatter must be one of json, console, compact')
+    return value
+
+
+class WryteConfig:
+    """A typed snapshot of Wryte's configuration.
+
+    All `WRYTE_*` environment variables (and, if `WRYTE_CONFIG_FILE` points
+    to one, a JSON config file) are parsed and validated once, when the
+    snapshot is loaded, instead of on every lookup.
+
+    Each variable can either be set globally (e.g. `WRYTE_CONSOLE_LEVEL`)
+    or for a specific logger by prefixing it with the logger's name
+    (e.g. `WRYTE_MY_LOGGER_CONSOLE_LEVEL` for the `my_logger` logger).
+
+    The config file is a flat JSON object using the same variable names
+    without the `WRYTE_` prefix (e.g. `{"MY_LOGGER_CONSOLE_LEVEL": "debug"}`).
+    Environment variables take precedence over the file.
+
+    Invalid values are dropped (so that defaults apply) with a warning
+    rather than raising, so that bad configuration never crashes the app.
+    Variables which aren't in `SCHEMA` (e.g. ones used by custom handlers)
+    are kept as is.
+    """
+
+    SCHEMA = {
+        'EC2_ENABLED': _to_bool,
+        'SIMPLE_CONSOLE': _to_bool,
+        'CONSOLE_DISABLED': _to_bool,
+        'CONSOLE_JSONIFY': _to_bool,
+        'CONSOLE_LEVEL': _to_level,
+        'HANDLERS_FILE_PATH': str,
+        'HANDLERS_FILE_NAME': str,
+        'HANDLERS_FILE_LEVEL': _to_level,
+        'HANDLERS_FILE_FORMATTER': _to_formatter,
+        'HANDLERS_FILE_ROTATE': _to_bool,
+        'HANDLERS_FILE_MAX_BYTES': int,
+        'HANDLERS_FILE_BACKUP_COUNT': int,
+        'STATS_ENABLED': _to_bool,
+        'STATS_INTERVAL': float,
+        'MAX_STRING_LENGTH': int,
+        'MAX_DEPTH': int,
+        'MAX_COLLECTION_LENGTH': int,
+        'MAX_RECORD_BYTES': int,
+        'HANDLERS_JOURNALD_ENABLED': _to_bool,
+        'HANDLERS_JOURNALD_NAME': str,
+        'HANDLERS_JOURNALD_LEVEL': _to_level,
+        'HANDLERS_JOURNALD_SOCKET': str,
+    }
+
+    def __init__(self, variables=None):
+        """Build a config from a mapping of variables (sans `WRYTE_` prefix)."""
+        self._values = {}
+        # Unknown variables, by their full name as their scope can't be told.
+        self._raw = {}
+        # Longest first so that the most specific variable name wins.
+        known = sorted(self.SCHEMA, key=len, reverse=True)
+
+        for key, value in (variables or {}).items():
+            key = key.upper()
+            self._raw[key] = value
+            for variable in known:
+                if key == variable:
+                    scope = None
+                elif key.endswith('_' + variable):
+                    scope = key[: -len(variable) - 1]
+                else:
+                    continue
+                try:
+                    self._values[(scope, variable)] = self.SCHEMA[variable](value)
+                except (TypeError, ValueError) as ex:
+                    warnings.warn('Ignoring invalid Wryte config WRYTE_{}={!r}: {}'.format(key, value, ex))
+                break
+
+    @classmethod
+    def load(cls, environ=None):
+        """Load a config snapshot from the environment and config file."""
+        environ = os.environ if environ is None else environ
+        variables = {}
+
+        config_file = environ.get('WRYTE_CONFIG_FILE')
+        if config_file:
+            try:
+                with open(config_file) as config:
+                    loaded = json.load(config)
+            except (OSError, ValueError) as ex:
+                warnings.warn('Could not read Wryte config file {}: {}'.format(config_file, ex))
+            else:
+                if isinstance(loaded, dict):
+                    variables.update(loaded)
+                else:
+                    warnings.warn('Ignoring Wryte config file {}: not a JSON object'.format(config_file))
+
+        variables.update((key[len('WRYTE_') :], value) for key, value in environ.items() if key.startswith('WRYTE_'))
+        return cls(variables)
+
+    def get(self, variable, name=None, default=None):
+        """Return the value of `variable` for the logger called `name`.
+
+        A logger specific value takes precedence over a global one.
+        Variables which aren't in `SCHEMA` are returned as they were set.
+        """
+        if variable not in self.SCHEMA:
+            if name is not None and '{}_{}'.format(name.upper(), variable) in self._raw:
+                return self._raw['{}_{}'.format(name.upper(), variable)]
+            return self._raw.get(variable, default)
+        if name is not None and (name.upper(), variable) in self._values:
+            return self._values[(name.upper(), variable)]
+        return self._values.get((None, variable), default)
+
+
+_config = None
+
+
+def get_config():
+    """Return the configuration snapshot shared by all Wryte instances."""
+    global _config  # pylint: disable=global-statement
+    if _config is None:
+        _config = WryteConfig.load()
+    return _config
+
+
+# Rendered frames by exception fingerprint (see `_serialize_exception`).
+_frames_cache = {}
+_frames_cache_lock = threading.Lock()
+FRAMES_CACHE_SIZE = 256
+
+
+def _serialize_exception(exc_info, max_frames, max_message):
+    """Return a structured representation of an exception.
+
+    e.g.
+    {
+        'type': 'ValueError',
+        'message': 'Boom',
+        'frames': [{'filename': 'app.py', 'lineno': 12, 'name': 'main', 'line': 'do()'}, ...],
+    }
+
+    Only the `max_frames` innermost frames and `max_message` characters
+    of the message are kept, and `frames_omitted` is added if frames were
+    dropped.
+
+    Rendering frames (which requires reading source lines) is cached by
+    a fingerprint of the exception type and the code locations it passed
+    through, so that a failure repeating in a loop is only rendered once.
+    The cached frames are shared between records and must not be mutated.
+    """
+    exc_type, exc, traceback = exc_info
+
+    locations = []
+    while traceback is not None:
+        locations.append((traceback.tb_frame.f_code, traceback.tb_lineno))
+        traceback = traceback.tb_next
+    omitted = max(len(locations) - max_frames, 0)
+    fingerprint = (exc_type, tuple(locations[omitted:]))
+
+    frames = _frames_cache.get(fingerprint)
+    if frames is None:
+        frames = [
+            {
+                'filename': code.co_filename,
+                'lineno': lineno,
+                'name': code.co_name,
+                'line': linecache.getline(code.co_filename, lineno).strip(),
+            }
+            for code, lineno in fingerprint[1]
+        ]
+        with _frames_cache_lock:
+            if len(_frames_cache) >= FRAMES_CACHE_SIZE:
+                # Evict the oldest entry (dicts preserve insertion order).
+                _frames_cache.pop(next(iter(_frames_cache)), None)
+            _frames_cache[fingerprint] = frames
+
+    if exc_type.__module__ == 'builtins':
+        type_name = exc_type.__qualname__
+    else:
+        type_name = '{}.{}'.format(exc_type.__module__, exc_type.__qualname__)
+
+    try:
+        message = str(exc)
+    except Exception:  # pylint: disable=broad-except
+        # Like `traceback`, so that logging a failure can't fail.
+        message = '<exception str() failed>'
+
+    serialized = {'type': type_name, 'message': message[:max_message], 'frames': frames}
+    if omitted:
+        serialized['frames_omitted'] = omitted
+    return serialized
+
+
+class RecordLimits:
+    """Limits bounding the cost of serializing a single record.
+
+    * `max_string`: Maximum length of strings (longer ones are cut).
+    * `max_depth`: Maximum nesting depth of dicts and lists. Deeper ones
+      are replaced with a short description (e.g. `<dict of 3 items>`).
+    * `max_items`: Maximum amount of items serialized per (nested) dict
+      or list.
+    * `max_bytes`: Maximum size of the serialized record. Once reached,
+      remaining fields are dropped.
+
+    `None` means unlimited. Records which were truncated in any way carry
+    a `_truncated: true` field.
+    """
+
+    def __init__(self, max_string=None, max_depth=None, max_items=None, max_bytes=None):
+        self.max_string = max_string
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return any(limit is not None for limit in (self.max_string, self.max_depth, self.max_items, self.max_bytes))
+
+
+class _BoundedJsonEncoder:
+    """Serialize a record to JSON while applying `RecordLimits`, in a single pass.
+
+    The output is the same as `json.dumps`'s as long as no limit is hit,
+    except for wryte's own fields, which are written first so that they
+    survive `max_bytes` truncation.
+    """
+
+    PRIORITY_FIELDS = ('timestamp', 'level', 'message', 'name', 'type', 'hostname', 'pid', 'cid')
+    MARKER = '"_truncated": true'
+
+    def __init__(self, limits, indent=None):
+        self.limits = limits
+        self.indent = indent
+        self.item_separator = ',' if indent is not None else ', '
+        self.chunks = []
+        self.size = 0
+        # Bytes needed to close all currently open containers.
+        self.closing = 0
+        self.truncated = False
+        self.full = False
+        # Room always left for the `_truncated` marker.
+        self.reserve = len(self.item_separator + self._newline(1) + self.MARKER)
+
+    def _room(self):
+        """Return the amount of bytes which may still be written."""
+        if self.limits.max_bytes is None:
+            return float('inf')
+        # Always leave room for closing open containers and for the marker.
+        return self.limits.max_bytes - self.size - self.closing - self.reserve
+
+    def _write(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+
+    def _string(self, value, room=None):
+        if self.limits.max_string is not None and len(value) > self.limits.max_string:
+            value = value[: self.limits.max_string]
+            self.truncated = True
+        encoded = json.encoder.encode_basestring_ascii(value)
+        if room is None or len(encoded) <= room:
+            return encoded
+        # Cut the string down to the room left, accounting for escaping.
+        self.truncated = True
+        cut = room - 2
+        while cut > 0:
+            encoded = json.encoder.encode_basestring_ascii(value[:cut])
+            if len(encoded) <= room:
+                return encoded
+            cut -= len(encoded) - room
+        return None
+
+    def _scalar(self, value):
+        if value is None:
+            return 'null'
+        if value is True:
+            return 'true'
+        if value is False:
+            return 'false'
+        if isinstance(value, int):
+            return int.__repr__(value)
+        if isinstance(value, float):
+            if value != value:  # pylint: disable=comparison-with-itself
+                return 'NaN'
+            if value in (float('inf'), float('-inf')):
+                return 'Infinity' if value > 0 else '-Infinity'
+            return float.__repr__(value)
+        raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+    def _key(self, key):
+        if isinstance(key, str):
+            return key
+        if isinstance(key, (bool, int, float)) or key is None:
+            return self._scalar(key)
+        raise TypeError('keys must be str, int, float, bool or None, not {}'.format(type(key).__name__))
+
+    def _newline(self, depth):
+        return '\n' + ' ' * (self.indent * depth) if self.indent is not None else ''
+
+    def _value(self, value, depth):
+        """Write `value`, returning False if it didn't fit at all."""
+        if isinstance(value, str):
+            encoded = self._string(value, self._room())
+        elif isinstance(value, (dict, list, tuple)):
+            if self.limits.max_depth is not None and depth > self.limits.max_depth:
+                self.truncated = True
+                kind = 'dict' if isinstance(value, dict) else 'list'
+                encoded = self._string('<{} of {} items>'.format(kind, len(value)), self._room())
+            else:
+                return self._container(value, depth)
+        else:
+            encoded = self._scalar(value)
+            if len(encoded) > self._room():
+                encoded = None
+
+        if encoded is None:
+            self.full = self.truncated = True
+            return False
+        self._write(encoded)
+        return True
+
+    def _container(self, value, depth, items=None):
+        is_dict = isinstance(value, dict)
+        opening, closing = ('{', '}') if is_dict else ('[', ']')
+        if items is None:
+            items = value.items() if is_dict else value
+        # The record itself (depth 0) is always written, even if empty.
+        if not value:
+            if depth and len(opening + closing) > self._room():
+                self.full = self.truncated = True
+                return False
+            self._write(opening + closing)
+            return True
+
+        closer = self._newline(depth) + closing
+        if depth and len(opening + closer) > self._room():
+            self.full = self.truncated = True
+            return False
+        self._write(opening)
+        self.closing += len(closer)
+
+        written = 0
+        for item in items:
+            if self.limits.max_items is not None and written >= self.limits.max_items and depth:
+                self.truncated = True
+                break
+            separator = (self.item_separator if written else '') + self._newline(depth + 1)
+            if is_dict:
+                key, item = item
+                prefix = separator + json.encoder.encode_basestring_ascii(self._key(key)) + ': '
+            else:
+                prefix = separator
+            # A member needs room for its prefix and at least a short value.
+            if len(prefix) + 4 > self._room():
+                self.full = self.truncated = True
+                break
+            mark = (len(self.chunks), self.size)
+            self._write(prefix)
+            if not self._value(item, depth + 1):
+                # Roll back the member's prefix.
+                del self.chunks[mark[0] :]
+                self.size = mark[1]
+                break
+            written += 1
+            if self.full:
+                break
+
+        if depth == 0 and self.truncated:
+            self._write((self.item_separator if written else '') + self._newline(1) + self.MARKER)
+        self.closing -= len(closer)
+        self._write(closer)
+        return True
+
+    def encode(self, record):
+        if not isinstance(record, dict):
+            return json.dumps(record, indent=self.indent)
+        priority = [(key, record[key]) for key in self.PRIORITY_FIELDS if key in record]
+        rest = ((key, value) for key, value in record.items() if key not in self.PRIORITY_FIELDS)
+        self._container(record, 0, itertools.chain(priority, rest))
+        return ''.join(self.chunks)
+
+
+_JSON_SCALARS = frozenset((type(None), bool, int, float))
+_MAX_CHECKED_DEPTH = 32
+
+
+def _within_limits(value, max_string, max_depth, max_items, depth=0):
+    """Return True if serializing `value` can't hit any limit but `max_bytes`.
+
+    This is a lot cheaper than `_BoundedJsonEncoder`, so that records within
+    the limits can be serialized with `json.dumps`. Very deep (or circular)
+    values are left to the encoder.
+    """
+    if depth > _MAX_CHECKED_DEPTH:
+        return False
+    # Keys are serialized the same way (and aren't limited) by both.
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, str):
+        return max_string is None or len(value) <= max_string
+    else:
+        return type(value) in _JSON_SCALARS or isinstance(value, (int, float))
+
+    if depth and ((max_depth is not None and depth > max_depth) or (max_items is not None and len(value) > max_items)):
+        return False
+    for item in items:
+        kind = type(item)
+        if kind is str:
+            if max_string is not None and len(item) > max_string:
+                return False
+        elif kind not in _JSON_SCALARS and not _within_limits(item, max_string, max_depth, max_items, depth + 1):
+            return False
+    return True
+
+
 class JsonFormatter(logging.Formatter):
-    def __init__(self, pretty=False):
+    def __init__(self, pretty=False, limits=None):
+        """If `limits` (a `RecordLimits` instance) is provided, records
+        are truncated while being serialized (see `RecordLimits`).
+        """
         self.pretty = pretty
+        self.limits = limits if limits is not None and limits.enabled else None
 
     def format(self, record):
-        return json.dumps(record.msg, indent=4 if self.pretty else None)
+        indent = 4 if self.pretty else None
+        limits = self.limits
+        if limits is None:
+            return json.dumps(record.msg, indent=indent)
+        # Most records are within the limits, so `json.dumps` is used when
+        # only `max_bytes` could be hit, and the (much slower) bounded
+        # encoder only when the output turns out to be too large.
+        if _within_limits(record.msg, limits.max_string, limits.max_depth, limits.max_items):
+            output = json.dumps(record.msg, indent=indent)
+            if limits.max_bytes is None or len(output) <= limits.max_bytes:
+                return output
+        return _BoundedJsonEncoder(limits, indent=indent).encode(record.msg)
 
 
 class ConsoleFormatter(logging.Formatter):
@@ -72,12 +577,7 @@ class ConsoleFormatter(logging.Formatter):
         self.pretty = pretty
         self.color = color
 
-        _simple = os.getenv('WRYTE_SIMPLE_CONSOLE')
-
-        if _simple is not None:
-            self.simple = _simple == "true"
-        else:
-            self.simple = simple
+        self.simple = get_config().get('SIMPLE_CONSOLE', default=simple)
 
     @staticmethod
     def _get_level_color(level):
@@ -114,6 +614,7 @@ class ConsoleFormatter(logging.Formatter):
         context (context i.e. k=v).
         """
         record = record.msg.copy()
+        exception = record.pop('exception', None)
 
         # Not popping and deleting later as pop is marginally less performant
         name = record['name']
@@ -138,10 +639,824 @@ class ConsoleFormatter(logging.Formatter):
         elif record:
             msg += '\n{}'.format(json.dumps(record, indent=4))
 
+        if isinstance(exception, dict) and 'frames' in exception:
+            msg += '\n' + self._format_exception(exception)
+        elif exception is not None:
+            msg += '\n  exception={}'.format(exception)
+
         return msg
 
+    @staticmethod
+    def _format_exception(exception):
+        """Render an exception serialized by Wryte like Python renders tracebacks."""
+        lines = ['Traceback (most recent call last):']
+        if exception.get('frames_omitted'):
+            lines.append('  ... {} frames omitted'.format(exception['frames_omitted']))
+        for frame in exception['frames']:
+            lines.append('  File "{filename}", line {lineno}, in {name}'.format(**frame))
+            if frame['line']:
+                lines.append('    ' + frame['line'])
+        lines.append('{}: {}'.format(exception['type'], exception['message']))
+        return '\n'.join(lines)
+
+
+COMPACT_MAGIC = b'WRYTE\x01'
+
+# Frame kinds. Each frame is a kind byte, a varint payload length and
+# the payload itself.
+_FRAME_SYMBOL = 0x53  # S: defines the next symbol (an interned string)
+_FRAME_BASE = 0x42  # B: defines the next set of interned base fields
+_FRAME_RECORD = 0x52  # R: a record referencing a base (0 for none)
+
+# Value tags.
+_TAG_NONE = 0x00
+_TAG_FALSE = 0x01
+_TAG_TRUE = 0x02
+_TAG_INT = 0x03
+_TAG_FLOAT = 0x04
+_TAG_STR = 0x05
+_TAG_SYMBOL = 0x06
+_TAG_LIST = 0x07
+_TAG_MAP = 0x08
+_TAG_TIMESTAMP = 0x09
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_SMALL_VARINTS = [bytes((i,)) for i in range(0x80)]
+
+
+def _varint(number):
+    if number < 0x80:
+        return _SMALL_VARINTS[number]
+    out = bytearray()
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+    return bytes(out)
+
+
+def _read_varint(data, offset):
+    number = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, offset
+        shift += 7
+
+
+class CompactFormatter(logging.Formatter):
+    """Formats records into a compact, length-prefixed binary encoding.
+
+    Unlike the JSON formatter, key names aren't repeated on each record.
+    Keys (and values of fields like `level`) are interned as symbols the
+    first time they're seen in a segment, and base fields (`name`,
+    `hostname`, `pid`, etc..) are written once per segment and referenced
+    by index from each record.
+
+    A segment starts with `COMPACT_MAGIC` and holds the state needed to
+    decode it, so `reset` must be called whenever a new segment (usually,
+    a new file) is started. `format` returns bytes rather than a string,
+    so this formatter is meant to be used with `CompactFileHandler`.
+
+    Use `decode_compact` (or `wryte decode`) to read records back.
+    """
+
+    BASE_FIELDS = (
+        'name',
+        'hostname',
+        'pid',
+        'type',
+        'ec2_instance_id',
+        'ec2_instance_type',
+        'ec2_region',
+        'ec2_ipv4',
+    )
+    SYMBOL_FIELDS = ('level',)
+    # Bound the per-segment tables, as keys may be arbitrary
+    # (e.g. `_bad_object_<uuid>`). Past the limits, values are written inline.
+    MAX_SYMBOLS = 4096
+    MAX_BASES = 256
+    MAX_SHAPES = 256
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        self.reset()
+
+    def reset(self):
+        """Start a new segment, forgetting all interned symbols and bases."""
+        self._symbols = {}
+        self._bases = {}
+        # Most records share a few sets of keys ("shapes"), for which the
+        # encoded key references are cached.
+        self._shapes = {}
+        # The last timestamp's second, and its microseconds since the epoch.
+        self._second = (None, 0)
+
+    def _frame(self, out, kind, payload):
+        out.append(kind)
+        out += _varint(len(payload))
+        out += payload
+
+    def _symbol(self, string, out, definitions):
+        reference = self._symbols.get(string)
+        if reference is None:
+            if len(self._symbols) >= self.MAX_SYMBOLS:
+                self._encode(string, out, definitions)
+                return
+            # Store the encoded reference itself, as it is all records need.
+            reference = self._symbols[string] = bytes((_TAG_SYMBOL,)) + _varint(len(self._symbols))
+            self._frame(definitions, _FRAME_SYMBOL, string.encode('utf-8'))
+        out += reference
+
+    def _encode(self, value, out, definitions):
+        kind = type(value)
+
+        if kind is str:
+            data = value.encode('utf-8')
+            out.append(_TAG_STR)
+            out += _varint(len(data))
+            out += data
+        elif kind is dict:
+            self._encode_map(value.items(), out, definitions)
+        elif value is None:
+            out.append(_TAG_NONE)
+        elif kind is bool:
+            out.append(_TAG_TRUE if value else _TAG_FALSE)
+        elif kind is int:
+            out.append(_TAG_INT)
+            # Zigzag encoding, so that small negative numbers stay small.
+            out += _varint(value << 1 if value >= 0 else (-value << 1) - 1)
+        elif kind is float:
+            out.append(_TAG_FLOAT)
+            out += struct.pack('<d', value)
+        elif kind in (list, tuple):
+            out.append(_TAG_LIST)
+            out += _varint(len(value))
+            for item in value:
+                self._encode(item, out, definitions)
+        elif isinstance(value, (str, bool, int, float, dict, list, tuple)):
+            # Subclasses (e.g. enums, OrderedDicts) are encoded as their base type.
+            for base in (str, bool, int, float, dict, list):
+                if isinstance(value, base):
+                    return self._encode(base(value), out, definitions)
+            return self._encode(list(value), out, definitions)
+        else:
+            raise TypeError('Object of type {} is not serializable'.format(kind.__name__))
+        return None
+
+    def _encode_map(self, items, out, definitions, top=False):
+        """Encode a map. `top` is True for the record's own fields."""
+        out.append(_TAG_MAP)
+        out += _varint(len(items))
+        for key, value in items:
+            self._symbol(str(key), out, definitions)
+            if key in self.SYMBOL_FIELDS and type(value) is str:  # pylint: disable=unidiomatic-typecheck
+                self._symbol(value, out, definitions)
+            elif top and key == 'timestamp' and type(value) is str:  # pylint: disable=unidiomatic-typecheck
+                self._encode_timestamp(value, out, definitions)
+            else:
+                self._encode(value, out, definitions)
+
+    def _encode_timestamp(self, value, out, definitions):
+        # Only use the binary form for timestamps formatted like
+        # `Wryte._get_timestamp`'s, which decode back to the very same string.
+        if len(value) != 26 or value[10] != 'T' or value[19] != '.' or not value[20:].isdigit():
+            self._encode(value, out, definitions)
+            return
+        second, second_micros = self._second
+        if value[:19] != second:
+            try:
+                second_micros = (datetime.fromisoformat(value[:19]) - _EPOCH) // _MICROSECOND
+            except (ValueError, TypeError):
+                self._encode(value, out, definitions)
+                return
+            self._second = (value[:19], second_micros)
+        micros = second_micros + int(value[20:])
+        out.append(_TAG_TIMESTAMP)
+        out += _varint(micros << 1 if micros >= 0 else (-micros << 1) - 1)
+
+    def _shape(self, keys, definitions):
+        """Return how records with the given keys are encoded.
+
+        That is, the base fields they hold, and for each other key: the key,
+        its encoded reference and whether its value is a symbol or a timestamp.
+        """
+        base_fields = tuple(key for key in self.BASE_FIELDS if key in keys)
+        members = []
+        for key in keys:
+            if key in base_fields:
+                continue
+            reference = bytearray()
+            self._symbol(str(key), reference, definitions)
+            members.append((key, bytes(reference), key in self.SYMBOL_FIELDS, key == 'timestamp'))
+        shape = (base_fields, members)
+        if len(self._shapes) < self.MAX_SHAPES:
+            self._shapes[keys] = shape
+        return shape
+
+    def _base(self, record, base_fields, out):
+        base = tuple((key, record[key]) for key in base_fields)
+        try:
+            index = self._bases.get(base)
+        except TypeError:
+            # Unhashable values, e.g. a dict bound as `name`.
+            return 0
+        if index is None:
+            if len(self._bases) >= self.MAX_BASES:
+                return 0
+            index = self._bases[base] = len(self._bases)
+            payload = bytearray()
+            self._encode_map(base, payload, out)
+            self._frame(out, _FRAME_BASE, payload)
+        return index + 1
+
+    def format(self, record):
+        """Return the frames encoding `record.msg` (and any new definitions)."""
+        record = record.msg
+        definitions = bytearray()
+        keys = tuple(record)
+        shape = self._shapes.get(keys) or self._shape(keys, definitions)
+        base_fields, members = shape
+        base_index = self._base(record, base_fields, definitions) if base_fields else 0
+
+        payload = bytearray(_varint(base_index))
+        if base_fields and not base_index:
+            self._encode_map(record.items(), payload, definitions, top=True)
+        else:
+            payload.append(_TAG_MAP)
+            payload += _varint(len(members))
+            for key, reference, is_symbol, is_timestamp in members:
+                payload += reference
+                value = record[key]
+                if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+                    self._encode(value, payload, definitions)
+                elif is_symbol:
+                    self._symbol(value, payload, definitions)
+                elif is_timestamp:
+                    self._encode_timestamp(value, payload, definitions)
+                else:
+                    data = value.encode('utf-8')
+                    payload.append(_TAG_STR)
+                    payload += _varint(len(data))
+                    payload += data
+
+        self._frame(definitions, _FRAME_RECORD, payload)
+        return bytes(definitions)
+
+
+class _CompactDecoder:
+    def __init__(self):
+        self.symbols = []
+        self.bases = []
+
+    def value(self, data, offset):
+        tag = data[offset]
+        offset += 1
+
+        if tag == _TAG_STR:
+            length, offset = _read_varint(data, offset)
+            return data[offset : offset + length].decode('utf-8'), offset + length
+        if tag == _TAG_SYMBOL:
+            index, offset = _read_varint(data, offset)
+            return self.symbols[index], offset
+        if tag == _TAG_MAP:
+            count, offset = _read_varint(data, offset)
+            mapping = {}
+            for _ in range(count):
+                key, offset = self.value(data, offset)
+                mapping[key], offset = self.value(data, offset)
+            return mapping, offset
+        if tag in (_TAG_INT, _TAG_TIMESTAMP):
+            number, offset = _read_varint(data, offset)
+            number = number >> 1 if not number & 1 else -((number + 1) >> 1)
+            if tag == _TAG_TIMESTAMP:
+                return (_EPOCH + number * _MICROSECOND).isoformat(timespec='microseconds'), offset
+            return number, offset
+        if tag == _TAG_LIST:
+            count, offset = _read_varint(data, offset)
+            items = []
+            for _ in range(count):
+                item, offset = self.value(data, offset)
+                items.append(item)
+            return items, offset
+        if tag == _TAG_FLOAT:
+            return struct.unpack_from('<d', data, offset)[0], offset + 8
+        if tag in (_TAG_NONE, _TAG_FALSE, _TAG_TRUE):
+            return (None, False, True)[tag], offset
+        raise WryteError('Unknown value tag {:#x}'.format(tag))
+
+
+def decode_compact(stream):
+    """Yield the records (dicts) encoded in a binary stream by `CompactFormatter`.
+
+    A stream may contain several segments (e.g. a file appended to by
+    several processes one after the other). `WryteError` is raised if the
+    stream is corrupt or truncated.
+    """
+    decoder = None
+
+    while True:
+        kind = stream.read(1)
+        if not kind:
+            return
+
+        if kind == COMPACT_MAGIC[:1]:
+            if stream.read(len(COMPACT_MAGIC) - 1) != COMPACT_MAGIC[1:]:
+                raise WryteError('Bad segment header')
+            decoder = _CompactDecoder()
+            continue
+        if decoder is None:
+            raise WryteError('Stream does not start with a segment header')
+
+        length = shift = 0
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                raise WryteError('Truncated frame')
+            length |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+        payload = _read_payload(stream, length)
+
+        if kind[0] not in (_FRAME_SYMBOL, _FRAME_BASE, _FRAME_RECORD):
+            raise WryteError('Unknown frame kind {!r}'.format(kind))
+        try:
+            record = _decode_frame(decoder, kind[0], payload)
+        except (IndexError, KeyError, TypeError, ValueError, OverflowError, RecursionError, struct.error) as ex:
+            # e.g. references to undefined symbols or cut values.
+            raise WryteError('Corrupt {!r} frame: {!r}'.format(kind, ex)) from ex
+        if record is not None:
+            yield record
+
+
+def _read_payload(stream, length, chunk_size=1 << 20):
+    # Read in chunks, so that a corrupt length can't make us allocate
+    # more than what the stream actually holds.
+    if length <= chunk_size:
+        payload = stream.read(length)
+    else:
+        payload = bytearray()
+        while len(payload) < length:
+            chunk = stream.read(min(chunk_size, length - len(payload)))
+            if not chunk:
+                break
+            payload += chunk
+        payload = bytes(payload)
+    if len(payload) != length:
+        raise WryteError('Truncated frame')
+    return payload
+
+
+def _decode_frame(decoder, kind, payload):
+    """Decode a frame's payload, returning a record for record frames."""
+    if kind == _FRAME_SYMBOL:
+        decoder.symbols.append(payload.decode('utf-8'))
+        return None
+    if kind == _FRAME_BASE:
+        decoder.bases.append(decoder.value(payload, 0)[0])
+        return None
+    base_index, offset = _read_varint(payload, 0)
+    if base_index > len(decoder.bases):
+        raise IndexError('base index out of range')
+    record = dict(decoder.bases[base_index - 1]) if base_index else {}
+    record.update(decoder.value(payload, offset)[0])
+    return record
+
+
+class CompactFileHandler(logging.handlers.RotatingFileHandler):
+    """A file handler writing records encoded by `CompactFormatter`.
+
+    The handler always uses a `CompactFormatter`, whatever formatter it
+    is added with. Each file opened by the handler starts a new segment. If `maxBytes`
+    is set, files are rotated like with `RotatingFileHandler`.
+
+    Symbols and bases are only meaningful within a segment, so a file must
+    have a single writer. The file is locked while open (on POSIX), and a
+    process which finds it locked by another one (e.g. another worker
+    process) writes to `<filename>.<pid>` instead. Like with
+    `WatchedFileHandler`, the file is reopened if it was moved or removed
+    (e.g. by logrotate), and a new segment is started if it was truncated.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, delay=False):  # pylint: disable=invalid-name
+        self._new_segment = True
+        self._pid = None
+        self._dev, self._ino, self._size = -1, -1, 0
+        logging.handlers.RotatingFileHandler.__init__(
+            self, filename, maxBytes=maxBytes, backupCount=backupCount, delay=delay
+        )
+        self.setFormatter(CompactFormatter())
+
+    def setFormatter(self, fmt):  # pylint: disable=invalid-name
+        """Set the formatter, which must be a `CompactFormatter`.
+
+        Other formatters (e.g. the `json` one `Wryte.add_handler` uses by
+        default) are ignored, as the handler writes bytes.
+        """
+        if isinstance(fmt, CompactFormatter):
+            logging.handlers.RotatingFileHandler.setFormatter(self, fmt)
+
+    def _open(self):
+        stream = open(self.baseFilename, 'ab')  # pylint: disable=consider-using-with
+        if fcntl is not None and not self._lock(stream):
+            stream.close()
+            filename = '{}.{}'.format(self.baseFilename, os.getpid())
+            warnings.warn(
+                'Compact file {} is being written by another process, writing to {} instead'.format(
+                    self.baseFilename, filename
+                )
+            )
+            self.baseFilename = filename
+            stream = open(self.baseFilename, 'ab')  # pylint: disable=consider-using-with
+            self._lock(stream)
+        stat = os.fstat(stream.fileno())
+        self._dev, self._ino, self._size = stat.st_dev, stat.st_ino, stat.st_size
+        self._pid = os.getpid()
+        self._new_segment = True
+        return stream
+
+    @staticmethod
+    def _lock(stream):
+        try:
+            fcntl.flock(stream.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def _reopen_if_needed(self):
+        # A forked process shares the parent's file (and lock), so it
+        # opens its own.
+        reopen = self._pid != os.getpid()
+        if not reopen and os.name != 'nt':
+            try:
+                stat = os.stat(self.baseFilename)
+            except FileNotFoundError:
+                reopen = True
+            else:
+                reopen = (stat.st_dev, stat.st_ino) != (self._dev, self._ino)
+                if stat.st_size < self._size:
+                    # Truncated (e.g. logrotate's copytruncate).
+                    self._new_segment = True
+        if reopen:
+            self.stream.close()
+            self.stream = None
+
+    def _encode(self, record):
+        if self.stream is not None:
+            self._reopen_if_needed()
+        if self.stream is None:
+            self.stream = self._open()
+        if self._new_segment:
+            self._new_segment = False
+            self.formatter.reset()
+            return COMPACT_MAGIC + self.format(record)
+        return self.format(record)
+
+    def emit(self, record):
+        try:
+            data = self._encode(record)
+            if self.maxBytes > 0 and self.stream.tell() and self.stream.tell() + len(data) >= self.maxBytes:
+                self.doRollover()
+                data = self._encode(record)
+            self.stream.write(data)
+            self.flush()
+            self._size = self.stream.tell()
+        except RecursionError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
+JOURNALD_SOCKET = '/run/systemd/journal/socket'
+SYSLOG_SOCKET = '/dev/log'
+
+# Wryte levels to syslog severities (which journald uses as `PRIORITY`).
+SYSLOG_PRIORITIES = {
+    'DEBUG': 7,
+    'INFO': 6,
+    'WARNING': 4,
+    'WARN': 4,
+    'ERROR': 3,
+    'CRITICAL': 2,
+}
+
+
+class _UnixDatagramHandler(logging.Handler):
+    """Base for handlers sending each record as a single Unix datagram.
+
+    The socket is non-blocking so that a busy receiver never blocks the
+    application. If a record can't be sent (the receiver's queue is full,
+    the socket doesn't exist, the record is too large, etc..), it is handed
+    to the `fallback` handler if one is provided or dropped otherwise.
+    Dropped records are counted in `dropped`.
+
+    Datagrams are built into a buffer which is reused for all records
+    (`emit` is called with the handler's lock held).
+    """
+
+    def __init__(self, address, fallback=None):
+        logging.Handler.__init__(self)
+        self.address = address
+        self.fallback = fallback
+        self.dropped = 0
+        self._buffer = bytearray()
+        self._socket = None
+
+    def _encode(self, record, buffer):
+        raise NotImplementedError()
+
+    def _send(self, buffer):
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)  # pylint: disable=no-member
+            try:
+                sock.setblocking(False)
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+        self._socket.sendmsg([buffer])
+
+    def _fall_back(self, record):
+        if self.fallback is not None:
+            self.fallback.handle(record)
+        else:
+            self.dropped += 1
+
+    def emit(self, record):
+        try:
+            self._buffer.clear()
+            self._encode(record, self._buffer)
+            self._send(self._buffer)
+        except (BlockingIOError, InterruptedError):
+            # The receiver is busy, but the socket itself is fine.
+            self._fall_back(record)
+        except OSError:
+            # e.g. the receiver is gone or the record is too large.
+            # Reconnect on the next record.
+            self._close_socket()
+            self._fall_back(record)
+        except RecursionError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+    def _close_socket(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def close(self):
+        self.acquire()
+        try:
+            self._close_socket()
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+
+class JournaldHandler(_UnixDatagramHandler):
+    """Send records to journald using its native protocol.
+
+    Context keys are sent as journal fields (e.g. `user_id` as `USER_ID`),
+    which journald stores without having to parse them out of a message.
+    `message` is sent as `MESSAGE`, `level` as the matching syslog
+    `PRIORITY` and the logger's name as `SYSLOG_IDENTIFIER`. Other keys
+    which would collide with those fields are prefixed with `CONTEXT_`
+    (e.g. `priority` is sent as `CONTEXT_PRIORITY`). Non-string values
+    are sent as JSON.
+
+    The handler's formatter isn't used, as fields are sent natively.
+    """
+
+    # Field names are cached since most records share the same keys.
+    # Keys may be arbitrary, so the cache is bounded.
+    MAX_CACHED_FIELDS = 1024
+    _RENAMED = {'message': 'MESSAGE', 'name': 'SYSLOG_IDENTIFIER', 'pid': 'SYSLOG_PID'}
+    _RESERVED = frozenset(('PRIORITY',) + tuple(_RENAMED.values()))
+
+    def __init__(self, address=JOURNALD_SOCKET, fallback=None):
+        _UnixDatagramHandler.__init__(self, address, fallback)
+        self._fields = {}
+
+    def _field_name(self, key):
+        field = self._fields.get(key)
+        if field is None:
+            field = self._RENAMED.get(key)
+            if field is None:
+                # Journal fields are made of uppercase letters, digits and
+                # underscores, can't start with an underscore (those are
+                # trusted fields) or a digit, and are at most 64 long.
+                field = ''.join(char if char.isalnum() and char.isascii() else '_' for char in str(key).upper())
+                field = field.lstrip('_0123456789')[:64]
+                if field in self._RESERVED:
+                    field = 'CONTEXT_' + field
+            if len(self._fields) < self.MAX_CACHED_FIELDS:
+                self._fields[key] = field
+        return field
+
+    @staticmethod
+    def _append_field(buffer, field, value):
+        data = value.encode('utf-8')
+        if b'\n' in data:
+            # Binary safe form: the name, a newline, a 64 bit LE length and the data.
+            buffer += field.encode('ascii')
+            buffer += b'\n'
+            buffer += struct.pack('<Q', len(data))
+        else:
+            buffer += field.encode('ascii')
+            buffer += b'='
+        buffer += data
+        buffer += b'\n'
+
+    def _encode(self, record, buffer):
+        fields = record.msg if isinstance(record.msg, dict) else {'message': record.getMessage()}
+        priority = SYSLOG_PRIORITIES.get(str(fields.get('level', record.levelname)).upper(), 6)
+        self._append_field(buffer, 'PRIORITY', str(priority))
+
+        for key, value in fields.items():
+            if key == 'level':
+                continue
+            field = self._field_name(key)
+            if not field:
+                continue
+            self._append_field(buffer, field, value if isinstance(value, str) else json.dumps(value, default=str))
+
+
+class SyslogDatagramHandler(_UnixDatagramHandler):
+    """Send records to a local syslog daemon over a Unix datagram socket.
+
+    Each record is sent as `<PRIORITY>NAME[PID]: MESSAGE` where the
+    message is the record formatted by the handler's formatter (JSON, by
+    default, when added via `Wryte.add_handler`).
+    """
+
+    def __init__(self, address=SYSLOG_SOCKET, facility=1, fallback=None):
+        _UnixDatagramHandler.__init__(self, address, fallback)
+        self.facility = facility
+
+    def _encode(self, record, buffer):
+        fields = record.msg if isinstance(record.msg, dict) else {}
+        severity = SYSLOG_PRIORITIES.get(str(fields.get('level', record.levelname)).upper(), 6)
+        buffer += '<{}>{}[{}]: '.format(
+            self.facility * 8 + severity, fields.get('name', record.name), fields.get('pid', record.process)
+        ).encode('utf-8')
+        buffer += self.format(record).encode('utf-8')
+
+
+class _Histogram:
+    """A latency histogram with power of two microsecond buckets."""
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    def add(self, seconds):
+        # Only called with the owning `WryteStats` lock held.
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1000000).bit_length(), self.BUCKETS - 1)] += 1
+
+    def _percentile(self, fraction):
+        threshold = self.count * fraction
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold:
+                # The bucket's upper bound, in microseconds.
+                return 1 << bucket
+        return 1 << (self.BUCKETS - 1)
+
+    def snapshot(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_us': round(self.total / self.count * 1000000, 3),
+            'max_us': round(self.max * 1000000, 3),
+            'p50_us': self._percentile(0.5),
+            'p90_us': self._percentile(0.9),
+            'p99_us': self._percentile(0.99),
+        }
+
+
+class _HandlerStats:
+    def __init__(self):
+        self.records = 0
+        self.dropped = 0
+        self.errors = 0
+        self.format = _Histogram()
+        self.emit = _Histogram()
+        # Time spent in the handler's `format` by the current thread's
+        # `emit`, so that it can be deducted from the time spent in `emit`.
+        self.local = threading.local()
+
+    def snapshot(self):
+        return {
+            'records': self.records,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'format': self.format.snapshot(),
+            'emit': self.emit.snapshot(),
+        }
+
+
+class WryteStats:
+    """Counters and latency histograms of a Wryte instance's hot path.
+
+    Records are counted per level (including ones dropped because of the
+    logger's level). For each handler, records handled, dropped (by the
+    handler's filters) and failed are counted, and the time spent
+    formatting and emitting records is kept in histograms.
+
+    Stats are only collected if enabled on the Wryte instance, in which
+    case the handlers' `handle`, `emit`, `format` and `handleError` methods
+    are wrapped when they are added. Otherwise, nothing is wrapped at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.levels = {}
+        self.dropped = 0
+        self.enrich = _Histogram()
+        self.handlers = {}
+
+    def record(self, level, elapsed, enabled):
+        with self._lock:
+            self.levels[level] = self.levels.get(level, 0) + 1
+            self.enrich.add(elapsed)
+            if not enabled:
+                self.dropped += 1
+
+    def instrument(self, handler):
+        """Wrap a handler's methods so that its stats are collected."""
+        stats = self.handlers.setdefault(handler.name, _HandlerStats())
+        lock = self._lock
+        handle = handler.handle
+        emit = handler.emit
+        format_record = handler.format
+        handle_error = handler.handleError
+        local = stats.local
+
+        def counted_handle(record):
+            emitted = handle(record)
+            if not emitted:
+                with lock:
+                    stats.dropped += 1
+            return emitted
+
+        def timed_emit(record):
+            # Called by `handle` with the handler's lock held, so waiting
+            # for the lock isn't accounted for as emit time.
+            local.format = 0.0
+            start = time.perf_counter()
+            emit(record)
+            elapsed = time.perf_counter() - start
+            with lock:
+                stats.records += 1
+                stats.format.add(local.format)
+                stats.emit.add(elapsed - local.format)
+
+        def timed_format(record):
+            start = time.perf_counter()
+            formatted = format_record(record)
+            local.format = getattr(local, 'format', 0.0) + time.perf_counter() - start
+            return formatted
+
+        def counted_handle_error(record):
+            with lock:
+                stats.errors += 1
+            handle_error(record)
+
+        handler.handle = counted_handle
+        handler.emit = timed_emit
+        handler.format = timed_format
+        handler.handleError = counted_handle_error
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'levels': dict(self.levels),
+                'dropped': self.dropped,
+                'enrich': self.enrich.snapshot(),
+                'handlers': {name: stats.snapshot() for name, stats in self.handlers.items()},
+            }
+
 
 class Wryte:
+    # Bound the size of exceptions serialized into records.
+    exception_max_frames = 32
+    exception_max_message = 2048
+
     def __init__(
         self,
         name=None,
@@ -153,6 +1468,10 @@ class Wryte:
         color=True,
         simple=False,
         enable_ec2=False,
+        cid_generator=None,
+        stats=False,
+        stats_interval=None,
+        limits=None,
     ):
         """Instantiate a logger instance.
 
@@ -165,10 +1484,24 @@ class Wryte:
         See `ConsoleFormatter` for information on `color`, `pretty` and
         `simple`.
 
+        `cid_generator` is a callable returning a new cid for each event
+        that isn't given one explicitly. It defaults to `generate_cid`
+        which returns time ordered ids.
+
+        If `stats` is True, counters and latency histograms are collected
+        (see `WryteStats`) and can be retrieved via `stats()`. If
+        `stats_interval` is also set, a record containing the stats is
+        logged (under `_stats`) at most every `stats_interval` seconds.
+
+        `limits` is a `RecordLimits` instance bounding the size of records
+        serialized by the JSON handlers Wryte creates. If not provided,
+        limits are read from the `WRYTE_MAX_*` config variables.
+
         `self.logger` exposes the stdlib's logging API directly so that
         the logger isn't bound only by what Wryte provides.
         """
         self.logger_name = name or __name__
+        self.cid_generator = cid_generator or generate_cid
 
         self.pretty = pretty
         self.color = color
@@ -177,9 +1510,26 @@ class Wryte:
         self.logger = self._logger(self.logger_name)
         self._log = self._get_base(self.logger_name, hostname, enable_ec2)
 
+        self._level = level
+        self._jsonify = jsonify
+        self._bare = bare
+        self._configured_handlers = []
+        self._limits = limits
+        self.limits = self._get_limits()
+
+        self._stats = None
+        if self._env('STATS_ENABLED', stats):
+            self._stats = WryteStats()
+            self._stats_interval = self._env('STATS_INTERVAL', stats_interval)
+            self._last_report = time.monotonic()
+            # Only instrumented instances pay for timing enrichment.
+            self._enrich = self._timed_enrich
+
         if not bare:
             self._configure_handlers(level, jsonify)
 
+        _wryters.add(self)
+
     @staticmethod
     def _logger(name):
         """Return a named logger instance."""
@@ -281,13 +1631,15 @@ class Wryte:
             'pid': 51223
         }
         """
-        log = self._log.copy()
+        log = self._bound_context()
 
         # Normalizes and adds dictionary-like context.
         log.update(self._normalize_objects(objects))
 
         # Adds k=v like context
         if kwargs:
+            if 'exc_info' in kwargs:
+                self._add_exception(log, kwargs.pop('exc_info'))
             log.update(kwargs)
 
         # Appends default fields.
@@ -297,11 +1649,55 @@ class Wryte:
 
         return log
 
+    def _add_exception(self, log, exc_info):
+        """Add an `exception` field to `log` given a stdlib-like `exc_info`.
+
+        `exc_info` can be True (to use the exception currently being
+        handled), an exception instance or an `exc_info` tuple.
+        """
+        if isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+        elif not isinstance(exc_info, tuple):
+            exc_info = sys.exc_info() if exc_info else None
+
+        if exc_info and exc_info[0] is not None:
+            log['exception'] = _serialize_exception(exc_info, self.exception_max_frames, self.exception_max_message)
+
+    def _timed_enrich(self, message, level, objects, kwargs=None):
+        start = time.perf_counter()
+        log = type(self)._enrich(self, message, level, objects, kwargs)
+        elapsed = time.perf_counter() - start
+
+        enabled = self.logger.isEnabledFor(LEVEL_CONVERSION.get(level.lower(), logging.NOTSET))
+        self._stats.record(log['level'], elapsed, enabled)
+
+        if self._stats_interval and time.monotonic() - self._last_report >= self._stats_interval:
+            self._last_report = time.monotonic()
+            self.logger.info(type(self)._enrich(self, 'Wryte stats', 'info', ({'_stats': self.stats()},)))
+        return log
+
+    def _get_limits(self):
+        """Return the instance's `RecordLimits`, or None if there are none."""
+        limits = self._limits or RecordLimits(
+            max_string=self._env('MAX_STRING_LENGTH'),
+            max_depth=self._env('MAX_DEPTH'),
+            max_items=self._env('MAX_COLLECTION_LENGTH'),
+            max_bytes=self._env('MAX_RECORD_BYTES'),
+        )
+        return limits if limits.enabled else None
+
+    def _bound_context(self):
+        """Return a copy of the base fields and context bound to the logger."""
+        return self._log.copy()
+
     def _env(self, variable, default=None):
-        """Return the value of an environment variable if it is set.
+        """Return the value of a config variable if it is set.
 
         This is done by first looking at `WRYTE_LOGGER_NAME_VARIABLE`
         and then looking at the more general `WRYTE_VARIABLE`.
+        Values are read from the shared config snapshot (see `WryteConfig`)
+        rather than from the environment on each call. Variables which
+        aren't in `WryteConfig.SCHEMA` are returned as they were set.
 
         For example, `WRYTE_MY_LOGGER_HANDLERS_LOGZIO_TOKEN` will return
         the content of `WRYTE_MY_LOGGER_HANDLERS_LOGZIO_TOKEN` if it is
@@ -310,15 +1706,18 @@ class Wryte:
         Setting the variable `WRYTE_HANDLERS_LOGZIO_TOKEN` means
         that it applies to all loggers.
         """
-        logger_env = os.getenv('WRYTE_{}_{}'.format(self.logger_name.upper(), variable))
-        global_env = os.getenv('WRYTE_{}'.format(variable))
-        return logger_env or global_env or default
+        return get_config().get(variable, self.logger_name, default)
 
     def _configure_handlers(self, level, jsonify=False):
         """Configure handlers for the logger's instance.
 
-        This is done on instantiation.
+        This is done on instantiation and whenever the config is reloaded.
+        The handlers created here are kept, so that a reload only replaces
+        them and not handlers added by the user (or by other instances
+        sharing the same logger).
         """
+        existing = list(self.logger.handlers)
+
         if not self._env('CONSOLE_DISABLED'):
             if self._env('CONSOLE_JSONIFY', jsonify):
                 self.add_default_json_handler(level)
@@ -328,6 +1727,30 @@ class Wryte:
         if self._env('HANDLERS_FILE_PATH'):
             self.add_file_handler()
 
+        if self._env('HANDLERS_JOURNALD_ENABLED'):
+            self.add_journald_handler()
+
+        self._configured_handlers = [handler for handler in self.logger.handlers if handler not in existing]
+
+    def _reconfigure(self):
+        """Replace the config based handlers with ones matching the current config.
+
+        Handlers added explicitly via `add_handler` are kept as is.
+        """
+        self.limits = self._get_limits()
+        if self._bare:
+            return
+
+        for handler in self._configured_handlers:
+            self.logger.removeHandler(handler)
+            self._close_handler(handler)
+
+        self._configure_handlers(self._level, self._jsonify)
+
+    def _close_handler(self, handler):
+        """Close a handler which was detached from the logger."""
+        handler.close()
+
     def _assert_level(self, level):
         levels = LEVEL_CONVERSION.keys()
 
@@ -340,9 +1763,12 @@ class Wryte:
         """Add a handler to the logger instance and return its name.
 
         A `handler` can be any standard `logging` handler.
-        `formatter` can be one of `console`, `json` or a formatter instance.
+        `formatter` can be one of `console`, `json`, `compact` or a formatter
+        instance.
 
         Choosing `console`/`json` will use the default console/json handlers.
+        The `compact` formatter outputs bytes and should only be used
+        with a `CompactFileHandler`.
         `name` is the handler's name (not the logger's name).
         """
         name = name or str(uuid.uuid4())
@@ -353,32 +1779,74 @@ class Wryte:
             return ''
 
         if formatter == 'json':
-            _formatter = JsonFormatter(self.pretty or False)
+            _formatter = JsonFormatter(self.pretty or False, self.limits)
         elif formatter == 'console':
             if COLOR_ENABLED:
                 colorama.init(autoreset=True)
             pretty = self.pretty in (None, True)
             _formatter = ConsoleFormatter(pretty, self.color, self.simple)
+        elif formatter == 'compact':
+            _formatter = CompactFormatter()
         else:
             _formatter = formatter
 
         handler.setFormatter(_formatter)
+        if self.limits is not None and not self._applies_limits(handler):
+            warnings.warn(
+                'Record limits are only applied by json formatters, handler {} of logger {} '
+                'will not apply them'.format(name, self.logger.name)
+            )
         try:
             handler.set_name(name)  # pytype: disable=attribute-error
         except AttributeError:
             handler.name = name
 
-        self.logger.addHandler(handler)
+        if self._stats is not None:
+            self._stats.instrument(handler)
+        self._attach_handler(handler)
 
         return name
 
+    def _attach_handler(self, handler):
+        """Attach a named, formatted handler to the logger."""
+        self.logger.addHandler(handler)
+
     def list_handlers(self):
         """Return a list of all handlers attached to a logger"""
         return [handler.name for handler in self.logger.handlers]
 
+    @staticmethod
+    def _applies_limits(handler):
+        """Return True if `handler` applies the logger's `RecordLimits`."""
+        # journald fields are encoded by the handler itself.
+        if isinstance(handler, JournaldHandler):
+            return False
+        return isinstance(handler.formatter, JsonFormatter) and handler.formatter.limits is not None
+
+    def stats(self):
+        """Return a snapshot of the logger's stats, or None if disabled.
+
+        e.g.
+        {
+            'levels': {'INFO': 1200, 'ERROR': 3},
+            'dropped': 0,
+            'enrich': {'count': 1203, 'mean_us': 4.1, 'max_us': 52.0, 'p50_us': 4, ...},
+            'handlers': {
+                '_console': {
+                    'records': 1203, 'dropped': 0, 'errors': 0,
+                    'format': {'count': 1203, 'mean_us': 11.3, ...},
+                    'emit': {'count': 1203, 'mean_us': 8.7, ...},
+                },
+            },
+        }
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
     def remove_handler(self, name):
         """Remove a handler by its name (set in `add_handler`)"""
-        for handler in self.logger.handlers:
+        for handler in list(self.logger.handlers):
             if handler.name == name:
                 self.logger.removeHandler(handler)
 
@@ -407,13 +1875,20 @@ class Wryte:
         level = self._env('HANDLERS_FILE_LEVEL', default='info')
         formatter = self._env('HANDLERS_FILE_FORMATTER', default='json')
 
-        if self._env('HANDLERS_FILE_ROTATE'):
-            try:
-                max_bytes = int(self._env('HANDLERS_FILE_MAX_BYTES', default=13107200))
-                backup_count = int(self._env('HANDLERS_FILE_BACKUP_COUNT', default=7))
-            except ValueError:
-                self.logger.exception('MAX_BYTES and BACKUP_COUNT must be integers')
-                return
+        if formatter == 'compact':
+            # Compact files are binary, rotate on their own and are watched
+            # for external rotation.
+            if self._env('HANDLERS_FILE_ROTATE'):
+                handler = CompactFileHandler(
+                    self._env('HANDLERS_FILE_PATH'),
+                    maxBytes=self._env('HANDLERS_FILE_MAX_BYTES', default=13107200),
+                    backupCount=self._env('HANDLERS_FILE_BACKUP_COUNT', default=7),
+                )
+            else:
+                handler = CompactFileHandler(self._env('HANDLERS_FILE_PATH'))
+        elif self._env('HANDLERS_FILE_ROTATE'):
+            max_bytes = self._env('HANDLERS_FILE_MAX_BYTES', default=13107200)
+            backup_count = self._env('HANDLERS_FILE_BACKUP_COUNT', default=7)
 
             handler = logging.handlers.RotatingFileHandler(
                 self._env('HANDLERS_FILE_PATH'), maxBytes=max_bytes, backupCount=backup_count
@@ -423,7 +1898,19 @@ class Wryte:
         else:
             handler = logging.handlers.WatchedFileHandler(self._env('HANDLERS_FILE_PATH'))
 
-        self.add_handler(handler=handler, name=name, formatter=formatter, level=level)
+        return self.add_handler(handler=handler, name=name, formatter=formatter, level=level)
+
+    def add_journald_handler(self, fallback=None):
+        """Add a `JournaldHandler` configured via `WRYTE_HANDLERS_JOURNALD_*`.
+
+        Records which can't be sent to journald are handed to `fallback`
+        (a handler) if provided, or dropped otherwise.
+        """
+        name = self._env('HANDLERS_JOURNALD_NAME', default='journald')
+        level = self._env('HANDLERS_JOURNALD_LEVEL', default='info')
+        handler = JournaldHandler(self._env('HANDLERS_JOURNALD_SOCKET', default=JOURNALD_SOCKET), fallback=fallback)
+
+        return self.add_handler(handler=handler, name=name, level=level)
 
     def set_level(self, level):
         """Set the current logger instance's level."""
@@ -458,7 +1945,7 @@ class Wryte:
         explicitly passed in kwargs. Additionally, the `type` of the
         log will be `event`, instead of log, like in other cases.
         """
-        cid = kwargs.get('cid', str(uuid.uuid4()))
+        cid = kwargs['cid'] if 'cid' in kwargs else self.cid_generator()
         objects = objects + ({'type': 'event', 'cid': cid},)
         obj = self._enrich(message, 'info', objects, kwargs)
         self.logger.info(obj)
@@ -517,11 +2004,215 @@ class Wryte:
         obj = self._enrich(message, 'critical', objects, kwargs)
         self.logger.critical(obj)
 
+    def exception(self, message, *objects, **kwargs):
+        """Log an error along with the exception currently being handled.
+
+        This is the same as calling `error` with `exc_info=True`.
+        The exception is added to the record as a structured `exception`
+        field (see `_serialize_exception`).
+        """
+        kwargs.setdefault('exc_info', True)
+        self.error(message, *objects, **kwargs)
+
+
+# Maps each AsyncWryte instance's context key to the context bound to it
+# in the current task. The mapping is copied on write so that context
+# bound in one task never leaks into its parent or sibling tasks.
+_task_context = contextvars.ContextVar('wryte_task_context', default={})
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than failing when the (bounded) queue is full.
+        self.queue.put(self._sentinel)
+
+
+class _QueueingHandler(logging.handlers.QueueHandler):
+    """A handler which hands records over to a dedicated thread.
+
+    The wrapped handler formats and emits records in a `QueueListener`
+    thread, so that a slow sink (e.g. a backpressured stdout) never blocks
+    the thread (or event loop) which logged the record.
+
+    At most `queue_size` records are kept waiting for the wrapped handler.
+    Records logged while the queue is full are dropped and counted in
+    `dropped`, so that a slow sink can't make memory grow without limit.
+    """
+
+    def __init__(self, handler, queue_size):
+        logging.handlers.QueueHandler.__init__(self, queue.Queue(queue_size))
+        self.handler = handler
+        self.set_name(handler.name)
+        self.dropped = 0
+        self.listener = _QueueListener(self.queue, handler, respect_handler_level=True)
+        self.listener.start()
+        self._stopped = False
+        self._stop_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Formatting is left to the wrapped handler, in the listener's thread.
+        return record
+
+    def enqueue(self, record):
+        # Called with the handler's lock held.
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Block until all queued records were emitted by the wrapped handler."""
+        self.queue.join()
+        self.handler.flush()
+
+    def close(self):
+        """Stop the listener after it emitted all queued records."""
+        with self._stop_lock:
+            if not self._stopped:
+                self._stopped = True
+                self.listener.stop()
+                self.handler.close()
+        logging.handlers.QueueHandler.close(self)
+
+
+class AsyncWryte(Wryte):
+    """A Wryte logger for asyncio applications.
+
+    Logging methods are the same as `Wryte`'s and can be called directly
+    from coroutines: each handler writes from a dedicated thread, so
+    logging only enqueues the record and never blocks the event loop on I/O.
+
+    Use `await wryter.flush()` to wait until all records were written and
+    `await wryter.aclose()` to flush and stop the handlers.
+
+    Context bound with `bind` is bound to the current task (and is inherited
+    by tasks it creates) rather than to the logger instance.
+
+    Each handler queues at most `queue_size` records. Records logged while
+    a handler's queue is full are dropped, and are counted in the handler's
+    `dropped` stat (see `stats`) along with the amount of `queued` records.
+    """
+
+    def __init__(self, *args, queue_size=10000, **kwargs):
+        self._context_key = object()
+        self.queue_size = queue_size
+        Wryte.__init__(self, *args, **kwargs)
+
+    def _attach_handler(self, handler):
+        self.logger.addHandler(_QueueingHandler(handler, self.queue_size))
+
+    def _close_handler(self, handler):
+        # Closing waits for the handler's queue to drain, which shouldn't
+        # block the caller (e.g. the event loop calling `reload_config`).
+        threading.Thread(target=handler.close, name='wryte-close-{}'.format(handler.name)).start()
+
+    def stats(self):
+        stats = Wryte.stats(self)
+        if stats is None:
+            return None
+        for handler in self._queueing_handlers():
+            handler_stats = stats['handlers'].setdefault(handler.name, {'dropped': 0})
+            handler_stats['dropped'] += handler.dropped
+            handler_stats['queued'] = handler.queue.qsize()
+        return stats
+
+    def _queueing_handlers(self):
+        return [handler for handler in self.logger.handlers if isinstance(handler, _QueueingHandler)]
+
+    def _bound_context(self):
+        log = self._log.copy()
+        context = _task_context.get().get(self._context_key)
+        if context:
+            log.update(context)
+        return log
+
+    def bind(self, *objects, **kwargs):
+        """Bind context to the current task.
+
+        After binding, each log entry logged from the task (or from tasks
+        it creates afterwards) will contain the bound fields.
+        """
+        contexts = dict(_task_context.get())
+        context = dict(contexts.get(self._context_key, {}))
+        context.update(self._normalize_objects(objects))
+        if kwargs:
+            context.update(kwargs)
+        contexts[self._context_key] = context
+        _task_context.set(contexts)
+
+    def unbind(self, *keys):
+        """Unbind context previously bound to the current task."""
+        contexts = dict(_task_context.get())
+        context = dict(contexts.get(self._context_key, {}))
+        for key in keys:
+            context.pop(key)
+        contexts[self._context_key] = context
+        _task_context.set(contexts)
+
+    def remove_handler(self, name):
+        """Remove a handler by its name.
+
+        The handler is detached right away, and its pending records are
+        written (and the handler closed) in the background. Use
+        `aremove_handler` to wait until that's done.
+        """
+        for handler in self._queueing_handlers():
+            if handler.name == name:
+                self.logger.removeHandler(handler)
+                self._close_handler(handler)
+
+    def _remove_handler(self, name):
+        for handler in self._queueing_handlers():
+            if handler.name == name:
+                self.logger.removeHandler(handler)
+                handler.close()
+
+    def _flush(self):
+        for handler in self._queueing_handlers():
+            handler.flush()
+
+    def _close(self):
+        for handler in self._queueing_handlers():
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    async def flush(self):
+        """Wait until all records logged so far were written by all handlers."""
+        await asyncio.get_running_loop().run_in_executor(None, self._flush)
+
+    async def aremove_handler(self, name):
+        """Remove a handler by its name, after writing its pending records."""
+        await asyncio.get_running_loop().run_in_executor(None, self._remove_handler, name)
+
+    async def aclose(self):
+        """Flush and close all handlers, detaching them from the logger."""
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
+
 
 class WryteError(Exception):
     pass
 
 
+# Live Wryte instances, so that a config reload can be applied to them.
+_wryters = weakref.WeakSet()
+
+
+def reload_config():
+    """Re-read Wryte's configuration and apply it to all live loggers.
+
+    Levels and config based handlers (console, json, file) of existing
+    Wryte instances are replaced according to the new config, without
+    recreating the loggers themselves. Handlers added via `add_handler`
+    and bound context are left untouched.
+    """
+    global _config  # pylint: disable=global-statement
+    _config = WryteConfig.load()
+
+    for wryter in list(_wryters):
+        wryter._reconfigure()  # pylint: disable=protected-access
+    return _config
+
+
 def _split_kv(pair):
     """Return dict for key=value."""
     key_value = pair.split('=', 1)
@@ -531,7 +2222,22 @@ def _split_kv(pair):
 if CLI_ENABLED:
     CLICK_CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'], token_normalize_func=lambda param: param.lower())
 
-    @click.command(context_settings=CLICK_CONTEXT_SETTINGS)
+    class _DefaultCommandGroup(click.Group):
+        """A group which runs its `log` command unless another command is named.
+
+        This keeps `wryte LEVEL MESSAGE` working alongside `wryte decode`.
+        """
+
+        def parse_args(self, ctx, args):
+            if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+                args.insert(0, 'log')
+            return click.Group.parse_args(self, ctx, args)
+
+    @click.group(cls=_DefaultCommandGroup, context_settings=CLICK_CONTEXT_SETTINGS)
+    def main():
+        """Simply Log"""
+
+    @main.command('log', context_settings=CLICK_CONTEXT_SETTINGS)
     @click.argument('LEVEL')
     @click.argument('MESSAGE')
     @click.argument('OBJECTS', nargs=-1)
@@ -549,7 +2255,8 @@ if CLI_ENABLED:
     @click.option('-n', '--name', type=click.STRING, default='Wryte', help="Change the default logger's name")
     @click.option('--no-color', is_flag=True, default=False, help='Disable coloring in console formatter')
     @click.option('--simple', is_flag=True, default=False, help='Log only message to the console')
-    def main(level, message, objects, pretty, jsonify, name, no_color, simple):
+    def log_command(level, message, objects, pretty, jsonify, name, no_color, simple):
+        """Log a MESSAGE with LEVEL (the default command)"""
         wryter = Wryte(name=name, pretty=pretty, level=level, jsonify=jsonify, color=not no_color, simple=simple)
 
         objcts = []
@@ -565,6 +2272,31 @@ if CLI_ENABLED:
 
         getattr(wryter, level.lower())(message, *objcts)
 
+    @main.command('decode', context_settings=CLICK_CONTEXT_SETTINGS)
+    @click.argument('FILES', type=click.File('rb'), nargs=-1, required=True)
+    @click.option(
+        '-c', '--console', is_flag=True, default=False, help='Output human readable messages instead of JSON lines'
+    )
+    @click.option(
+        '--pretty/--ugly', is_flag=True, default=True, help='Output JSON instead of key=value pairs for console'
+    )
+    @click.option('--no-color', is_flag=True, default=False, help='Disable coloring in console output')
+    def decode(files, console, pretty, no_color):
+        """Decode files written with the compact formatter"""
+        if console:
+            formatter = ConsoleFormatter(pretty=pretty, color=not no_color)
+            if COLOR_ENABLED:
+                colorama.init(autoreset=True)
+        else:
+            formatter = JsonFormatter()
+
+        for compact_file in files:
+            try:
+                for record in decode_compact(compact_file):
+                    click.echo(formatter.format(logging.makeLogRecord({'msg': record})))
+            except WryteError as ex:
+                raise click.ClickException('{}: {}'.format(compact_file.name, ex))
+
 else:
 
     def main():